@@ -0,0 +1,92 @@
+"""
+Address Parsing Module
+
+Parses the stringified address dicts in offerings.csv into locality, region,
+street address and postal code in a single pass
+"""
+import ast
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+ADDRESS_FIELDS = {
+    "locality": "locality",
+    "region": "region",
+    "street_address": "street-address",
+    "postal_code": "postal-code",
+}
+
+# Only fan out to multiple processes when the table is large enough to pay for it
+PARALLEL_MIN_ROWS = 50_000
+
+# Matches one 'key': 'value' pair of a Python dict repr. Values are quoted with
+# double quotes when they contain an apostrophe.
+_PAIR_RE = re.compile(
+    r"""'([a-z_-]+)':\s*(?:'([^'\\]*)'|"([^"\\]*)"|None)\s*(?:,\s*|$)"""
+)
+_EMPTY = (None,) * len(ADDRESS_FIELDS)
+
+
+def _literal_fields(text):
+    """
+    Slow path: parses an address with ast.literal_eval, returning empty fields if malformed
+    """
+    try:
+        address = ast.literal_eval(text)
+    except (ValueError, SyntaxError, MemoryError, RecursionError):
+        return _EMPTY
+    if not isinstance(address, dict):
+        return _EMPTY
+    return tuple(address.get(key) for key in ADDRESS_FIELDS.values())
+
+
+def parse_address(text):
+    """
+    Parses one address string into a (locality, region, street_address, postal_code) tuple
+    """
+    if not isinstance(text, str):
+        return _EMPTY
+    text = text.strip()
+    if not (text.startswith("{") and text.endswith("}")):
+        return _literal_fields(text)
+    body = text[1:-1].strip()
+    pairs = {}
+    pos = 0
+    while pos < len(body):
+        m = _PAIR_RE.match(body, pos)
+        if not m:
+            # Escapes, nested values or anything unexpected go through the slow path
+            return _literal_fields(text)
+        value = m.group(2) if m.group(2) is not None else m.group(3)
+        pairs[m.group(1)] = value
+        pos = m.end()
+    return tuple(pairs.get(key) for key in ADDRESS_FIELDS.values())
+
+
+def _parse_chunk(texts):
+    """
+    Parses a list of address strings
+    """
+    return [parse_address(text) for text in texts]
+
+
+def parse_addresses(addresses, workers=1):
+    """
+    Extracts the address fields of a Series of address strings into a DataFrame.
+    Large tables are split across `workers` processes.
+    """
+    texts = addresses.tolist()
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers > 1 and len(texts) >= PARALLEL_MIN_ROWS:
+        chunk_size = -(-len(texts) // workers)
+        chunks = [texts[i : i + chunk_size] for i in range(0, len(texts), chunk_size)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            rows = [row for chunk in pool.map(_parse_chunk, chunks) for row in chunk]
+    else:
+        rows = _parse_chunk(texts)
+    return pd.DataFrame(
+        rows, columns=list(ADDRESS_FIELDS), index=addresses.index
+    ).astype("string")
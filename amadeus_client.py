@@ -0,0 +1,212 @@
+"""
+Amadeus Client Module
+
+Shared access to the Amadeus API: one authenticated client for every call,
+a persistent TTL cache for reference data (city to IATA code, city to hotel
+list), coalescing of identical in-flight requests and a token-bucket rate limiter
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime, timezone
+
+from amadeus import Client, ResponseError
+
+from rate_limit import TokenBucket
+
+CACHE_PATH = os.path.join("data", "amadeus_cache.sqlite")
+# City IATA codes and hotel lists rarely change
+REFERENCE_TTL = 30 * 24 * 60 * 60
+# Empty answers (no IATA code, no hotels) may be transient, so they are retried sooner
+EMPTY_TTL = 60 * 60
+
+# The Amadeus test environment allows 10 requests per second
+RATE_LIMIT = float(os.getenv("AMADEUS_RATE_LIMIT", "10"))
+RATE_BURST = 10
+
+
+class ReferenceCache:
+    """
+    SQLite-backed key/value cache where every entry expires after its own TTL
+    """
+
+    def __init__(self, path=CACHE_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Batch mode shares the cache between processes, so wait for their writes
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "fetched_at REAL NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    def get(self, key):
+        """
+        Returns (value, fetched_at) for a live entry, or None
+        """
+        with self.lock:
+            row = self._conn.execute(
+                "SELECT value, fetched_at FROM entries WHERE key = ? AND expires_at > ?",
+                (key, time.time()),
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), datetime.fromtimestamp(row[1], timezone.utc)
+
+    def put(self, key, value, ttl):
+        """
+        Stores a JSON-serializable value for ttl seconds and returns its fetch time
+        """
+        now = time.time()
+        with self.lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now + ttl),
+            )
+            self._conn.execute("DELETE FROM entries WHERE expires_at <= ?", (now,))
+            self._conn.commit()
+        return datetime.fromtimestamp(now, timezone.utc)
+
+
+def create_client():
+    """
+    Creates an Amadeus client from the environment.
+    AMADEUS_HOST, AMADEUS_PORT and AMADEUS_SSL point it at another server, such as
+    fakes/amadeus_server.py.
+    """
+    options = {}
+    if os.getenv("AMADEUS_HOST"):
+        options["host"] = os.getenv("AMADEUS_HOST")
+        options["port"] = int(os.getenv("AMADEUS_PORT", "443"))
+        options["ssl"] = os.getenv("AMADEUS_SSL", "true").lower() == "true"
+    return Client(
+        client_id=os.getenv("AMADEUS_CLIENT_ID"),
+        client_secret=os.getenv("AMADEUS_CLIENT_SECRET"),
+        **options,
+    )
+
+
+class AmadeusGateway:
+    """
+    All Amadeus calls made by the recommender go through one gateway
+    """
+
+    def __init__(self, client=None, cache=None, rate_limiter=None):
+        self.client = client or create_client()
+        self.cache = cache or ReferenceCache()
+        self.rate_limiter = rate_limiter or TokenBucket(RATE_LIMIT, RATE_BURST)
+        self.calls = 0
+        self._lock = threading.Lock()
+        self._in_flight = {}
+
+    def _call(self, endpoint, **params):
+        """
+        Makes one rate limited API call and returns its data
+        """
+        self.rate_limiter.acquire()
+        with self._lock:
+            self.calls += 1
+        return endpoint.get(**params).data
+
+    def _coalesced(self, key, load):
+        """
+        Runs load() once for concurrent callers asking for the same key
+        """
+        with self._lock:
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = self._in_flight[key] = Future()
+        if not owner:
+            return future.result()
+        try:
+            result = load()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+    def _cached(self, key, load, ttl=REFERENCE_TTL):
+        """
+        Returns (value, fetched_at) from the cache, loading and storing it on a miss.
+        Empty values are only kept for EMPTY_TTL.
+        """
+        def load_and_store():
+            entry = self.cache.get(key)
+            if entry is not None:
+                return entry
+            value = load()
+            return value, self.cache.put(key, value, ttl if value else min(ttl, EMPTY_TTL))
+
+        entry = self.cache.get(key)
+        if entry is not None:
+            return entry
+        return self._coalesced(key, load_and_store)
+
+    def get_iata_code(self, city, region):
+        """
+        Tries to get the IATA code for a city using the Amadeus API.
+        """
+        def lookup():
+            country_code = "US" if region and len(region) == 2 else None
+            params = {"keyword": city}
+            if country_code:
+                params["countryCode"] = country_code
+            cities = self._call(self.client.reference_data.locations.cities, **params)
+            # Try to match region/state if possible
+            for c in cities or []:
+                if (
+                    "address" in c
+                    and c["address"].get("stateCode", "").upper()
+                    == (region or "").upper()
+                ):
+                    print(f"IATA code found by city/region: {c['iataCode']}")
+                    return c["iataCode"]
+            # If no state match, return the first result's IATA code
+            if cities:
+                print(f"IATA code found by city: {cities[0]['iataCode']}")
+                return cities[0]["iataCode"]
+            return None
+
+        try:
+            iata_code, _ = self._cached(f"iata:{city}|{region}", lookup)
+            if iata_code:
+                return iata_code
+        except ResponseError as error:
+            print(f"Amadeus city/region lookup error: {error}")
+        except Exception as e:
+            print(f"Unexpected error during IATA lookup: {e}")
+        # Fallback: use first 3 letters of city name
+        print(f"No IATA code found for {city}, {region}. Using fallback.")
+        return city[:3].upper()
+
+    def get_hotels(self, iata_code):
+        """
+        Returns the Amadeus hotel list within 30 miles of a city and when it was fetched.
+        Errors propagate to the caller and are not cached.
+        """
+        return self._cached(
+            f"hotels:{iata_code}",
+            lambda: self._call(
+                self.client.reference_data.locations.hotels.by_city,
+                cityCode=iata_code,
+                radius=30,
+                radiusUnit="MI",
+            )
+            or [],
+        )
+
+    def search_offers(self, **params):
+        """
+        Searches current hotel offers
+        """
+        return self._call(self.client.shopping.hotel_offers_search, **params)
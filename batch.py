@@ -0,0 +1,277 @@
+"""
+Batch Recommendations
+
+Precomputes the top hotels for many localities and queries, e.g. nightly.
+Localities are spread over a process pool whose processes share one Amadeus and
+one DeepSeek rate limit. Every finished (locality, query) pair is checkpointed in
+a single SQLite output store, so rerunning an interrupted run only computes what
+is missing.
+
+Usage:
+    python batch.py --queries "quiet, good breakfast" "family friendly" \
+        [--queries-file queries.txt] [--localities Boston "New York City"] \
+        [--workers 4] [--run nightly-2026-10-18] [--output data/batch/recommendations.sqlite]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+import amadeus_client
+import deepseek_enrichment
+from amadeus_client import AmadeusGateway
+from data_acquisition import acquire_dataset
+from data_cache import ensure_cache, load_offerings
+from pipeline import OFFERINGS_COLUMNS, default_dates, parse_offerings
+from rate_limit import SharedTokenBucket
+from server import RecommenderService
+
+OUTPUT_PATH = os.path.join("data", "batch", "recommendations.sqlite")
+WORKERS = min(4, os.cpu_count() or 1)
+
+
+class ResultStore:
+    """
+    SQLite store of batch recommendations and of which (locality, query) pairs of a
+    run are done. Every worker process writes its results to it as they finish.
+    """
+
+    def __init__(self, path=OUTPUT_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30)
+        self._conn.executescript(
+            """
+            PRAGMA journal_mode = WAL;
+            CREATE TABLE IF NOT EXISTS recommendations (
+                run TEXT NOT NULL, locality TEXT NOT NULL, query TEXT NOT NULL,
+                rank INTEGER NOT NULL, hotel_id TEXT, name TEXT, score REAL,
+                key_points TEXT, price TEXT, currency TEXT, price_status TEXT,
+                iata_code TEXT, check_in TEXT, check_out TEXT,
+                PRIMARY KEY (run, locality, query, rank)
+            );
+            CREATE TABLE IF NOT EXISTS progress (
+                run TEXT NOT NULL, locality TEXT NOT NULL, query TEXT NOT NULL,
+                status TEXT NOT NULL, error TEXT, finished_at REAL NOT NULL,
+                PRIMARY KEY (run, locality, query)
+            );
+            """
+        )
+
+    def completed(self, run):
+        """
+        Returns the set of (locality, query) pairs finished in a run
+        """
+        rows = self._conn.execute(
+            "SELECT locality, query FROM progress WHERE run = ? AND status = 'done'", (run,)
+        )
+        return set(rows)
+
+    def save(self, run, locality, query, result):
+        """
+        Replaces the stored recommendations of a pair and marks it done
+        """
+        with self._conn:
+            self._conn.execute(
+                "DELETE FROM recommendations WHERE run = ? AND locality = ? AND query = ?",
+                (run, locality, query),
+            )
+            self._conn.executemany(
+                "INSERT INTO recommendations VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        run, locality, query, rank, hotel["hotel_id"], hotel["name"],
+                        hotel["score"], json.dumps(hotel["key_points"]), hotel["price"],
+                        hotel["currency"], hotel["price_status"], result["iata_code"],
+                        result["check_in"], result["check_out"],
+                    )
+                    for rank, hotel in enumerate(result["hotels"], 1)
+                ],
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO progress VALUES (?, ?, ?, 'done', NULL, ?)",
+                (run, locality, query, time.time()),
+            )
+
+    def save_failure(self, run, locality, query, error):
+        """
+        Records that a pair failed, so it is retried by the next run with the same name
+        """
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO progress VALUES (?, ?, ?, 'failed', ?, ?)",
+                (run, locality, query, str(error), time.time()),
+            )
+
+
+# Each worker process holds its own warm service and store connection
+_service = None
+_store = None
+
+
+def _init_worker(amadeus_limiter, deepseek_limiter, output_path):
+    """
+    Builds the worker's service around the rate limiters shared by all workers
+    """
+    global _service, _store
+    _store = ResultStore(output_path)
+    deepseek_enrichment.rate_limiter = deepseek_limiter
+    _service = RecommenderService(
+        gateway=AmadeusGateway(rate_limiter=amadeus_limiter),
+        # The parent already made sure the dataset and cache are current
+        offerings_df=parse_offerings(load_offerings(columns=OFFERINGS_COLUMNS)),
+    )
+
+
+def _recommend_locality(run, locality, queries, check_in, check_out, adults):
+    """
+    Runs every query for one locality, so its hotels are fetched and matched once, and
+    stores each result as soon as it is ready. Returns the (finished, failed) counts.
+    """
+    finished = failed = 0
+    for query in queries:
+        try:
+            result = _service.recommend(locality, query, check_in, check_out, adults)
+        except Exception as e:
+            failed += 1
+            _store.save_failure(run, locality, query, e)
+            print(f"Failed {locality} / {query}: {e}")
+            continue
+        finished += 1
+        _store.save(run, locality, query, result)
+    return finished, failed
+
+
+def requests_per_second(value):
+    """
+    Parses a requests-per-second argument, where 0 means unlimited
+    """
+    value = float(value)
+    if value < 0:
+        raise argparse.ArgumentTypeError("must be 0 (unlimited) or positive")
+    return value
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute hotel recommendations")
+    parser.add_argument("--queries", nargs="*", default=[])
+    parser.add_argument("--queries-file", help="File with one query per line")
+    parser.add_argument(
+        "--localities", nargs="*", help="Localities to compute (default: all of them)"
+    )
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument(
+        "--run",
+        default=datetime.now().strftime("%Y-%m-%d"),
+        help="Run name; rerunning a run resumes it (default: today's date)",
+    )
+    parser.add_argument("--output", default=OUTPUT_PATH)
+    parser.add_argument("--check-in")
+    parser.add_argument("--check-out")
+    parser.add_argument("--adults", type=int, default=1)
+    parser.add_argument(
+        "--amadeus-rate",
+        type=requests_per_second,
+        default=amadeus_client.RATE_LIMIT,
+        help="Amadeus requests per second across all workers (0: unlimited)",
+    )
+    parser.add_argument(
+        "--deepseek-rate",
+        type=requests_per_second,
+        default=deepseek_enrichment.RATE_LIMIT,
+        help="DeepSeek requests per second across all workers (0: unlimited)",
+    )
+    args = parser.parse_args()
+
+    queries = list(args.queries)
+    if args.queries_file:
+        with open(args.queries_file) as f:
+            queries += [line.strip() for line in f if line.strip()]
+    if not queries:
+        parser.error("no queries given")
+    check_in, check_out = args.check_in, args.check_out
+    if not check_in or not check_out:
+        check_in, check_out = default_dates()
+
+    acquire_dataset()
+    ensure_cache()
+    localities = args.localities or sorted(
+        parse_offerings(load_offerings(columns=["locality", "street_address", "postal_code"]))[
+            "locality"
+        ]
+        .dropna()
+        .unique()
+    )
+
+    store = ResultStore(args.output)
+    done = store.completed(args.run)
+    pending = {}
+    for locality in localities:
+        missing = [query for query in queries if (locality, query) not in done]
+        if missing:
+            pending[locality] = missing
+    total = sum(len(qs) for qs in pending.values())
+    print(
+        f"Run {args.run}: {len(localities) * len(queries) - total} of "
+        f"{len(localities) * len(queries)} recommendations already done, {total} to compute "
+        f"for {len(pending)} localities with {args.workers} workers."
+    )
+    if not pending:
+        return
+
+    context = multiprocessing.get_context("spawn")
+    amadeus_limiter = SharedTokenBucket(
+        args.amadeus_rate, amadeus_client.RATE_BURST, context
+    )
+    deepseek_limiter = (
+        SharedTokenBucket(args.deepseek_rate, deepseek_enrichment.MAX_CONCURRENCY, context)
+        if args.deepseek_rate
+        else None
+    )
+    finished = failed = 0
+    with ProcessPoolExecutor(
+        max_workers=args.workers,
+        mp_context=context,
+        initializer=_init_worker,
+        initargs=(amadeus_limiter, deepseek_limiter, args.output),
+    ) as pool:
+        futures = {
+            pool.submit(
+                _recommend_locality,
+                args.run,
+                locality,
+                locality_queries,
+                check_in,
+                check_out,
+                args.adults,
+            ): locality
+            for locality, locality_queries in pending.items()
+        }
+        for future in as_completed(futures):
+            locality = futures[future]
+            try:
+                locality_finished, locality_failed = future.result()
+            except Exception as e:
+                # Unfinished queries of the locality are left for the next run
+                print(f"Worker for {locality} failed: {e}")
+                continue
+            finished += locality_finished
+            failed += locality_failed
+            print(f"[{finished + failed}/{total}] {locality} done")
+
+    print(
+        f"Run {args.run}: computed {finished} recommendations, {failed} failed. "
+        f"Results are in {args.output}."
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Batch Planner Module
+
+Packs hotel review records into LLM prompts up to a token budget, truncating
+reviews of hotels that would not fit in a prompt on their own
+"""
+import json
+import math
+
+# Rough characters per token for English text and JSON
+CHARS_PER_TOKEN = 4
+# Review text is never truncated below this many characters before whole reviews are dropped
+MIN_REVIEW_CHARS = 200
+
+
+def estimate_tokens(text):
+    """
+    Estimates the number of tokens in a string
+    """
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def record_tokens(record):
+    """
+    Estimates the tokens a hotel record adds to a prompt
+    """
+    # +1 for the ", " separating records in the JSON array
+    return estimate_tokens(json.dumps(record)) + 1
+
+
+def fit_record(record, max_tokens):
+    """
+    Returns the record unchanged if it fits in max_tokens, otherwise a copy with review
+    texts truncated and, if that is not enough, the last reviews dropped
+    """
+    if record_tokens(record) <= max_tokens:
+        return record
+    reviews = [dict(review) for review in record.get("reviews", [])]
+    fitted = {**record, "reviews": reviews}
+    text_chars = max((len(r.get("text") or "") for r in reviews), default=0)
+    while text_chars > MIN_REVIEW_CHARS and record_tokens(fitted) > max_tokens:
+        text_chars = max(MIN_REVIEW_CHARS, text_chars * 3 // 4)
+        for review in reviews:
+            if review.get("text") and len(review["text"]) > text_chars:
+                review["text"] = review["text"][:text_chars] + "..."
+    while reviews and record_tokens(fitted) > max_tokens:
+        reviews.pop()
+    return fitted
+
+
+def plan_batches(token_counts, token_budget, max_hotels):
+    """
+    Bin packs records into as few batches as possible with first-fit decreasing.
+    Each batch holds at most max_hotels records totalling at most token_budget tokens.
+    Returns lists of record positions.
+    """
+    order = sorted(range(len(token_counts)), key=lambda i: token_counts[i], reverse=True)
+    batches = []
+    loads = []
+    for i in order:
+        for n, batch in enumerate(batches):
+            if len(batch) < max_hotels and loads[n] + token_counts[i] <= token_budget:
+                batch.append(i)
+                loads[n] += token_counts[i]
+                break
+        else:
+            batches.append([i])
+            loads.append(token_counts[i])
+    return [sorted(batch) for batch in batches]
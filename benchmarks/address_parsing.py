@@ -0,0 +1,96 @@
+"""
+Address Parsing Benchmark
+
+Compares the original four-pass ast.literal_eval parsing against the single-pass
+parser on offerings.csv and checks that both produce the same fields. Without a
+path, offerings.csv is read from the dataset in data/raw, zipped or not.
+
+Usage: python -m benchmarks.address_parsing [path/to/offerings.csv] [--workers N]
+"""
+import argparse
+import ast
+import time
+
+import pandas as pd
+
+from address_parsing import parse_addresses
+from data_cache import RAW_DIR, open_csv
+
+
+def parse_addresses_literal_eval(addresses):
+    """
+    The original approach: one ast.literal_eval pass over the column per field
+    """
+    return pd.DataFrame(
+        {
+            "locality": addresses.apply(
+                lambda x: ast.literal_eval(x).get("locality") if pd.notnull(x) else None
+            ),
+            "region": addresses.apply(
+                lambda x: ast.literal_eval(x).get("region") if pd.notnull(x) else None
+            ),
+            "street_address": addresses.apply(
+                lambda x: (
+                    ast.literal_eval(x).get("street-address") if pd.notnull(x) else None
+                )
+            ),
+            "postal_code": addresses.apply(
+                lambda x: (
+                    ast.literal_eval(x).get("postal-code") if pd.notnull(x) else None
+                )
+            ),
+        },
+        index=addresses.index,
+    ).astype("string")
+
+
+def best_time(fn, repeat):
+    """
+    Runs fn `repeat` times and returns the fastest wall time and the last result
+    """
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("path", nargs="?")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.path:
+        addresses = pd.read_csv(args.path, usecols=["address"])["address"]
+    else:
+        with open_csv(RAW_DIR, "offerings.csv") as source:
+            addresses = pd.read_csv(source, usecols=["address"])["address"]
+    print(f"Parsing {len(addresses)} addresses from {args.path or RAW_DIR}")
+
+    baseline_time, expected = best_time(
+        lambda: parse_addresses_literal_eval(addresses), args.repeat
+    )
+    single_time, single = best_time(lambda: parse_addresses(addresses), args.repeat)
+    parallel_time, parallel = best_time(
+        lambda: parse_addresses(addresses, workers=args.workers), args.repeat
+    )
+
+    for label, result in (("single-pass", single), ("parallel", parallel)):
+        if not result.equals(expected):
+            raise SystemExit(f"{label} parser output differs from ast.literal_eval")
+
+    print(f"{'approach':<24}{'seconds':>10}{'speedup':>10}")
+    for label, seconds in (
+        ("4x ast.literal_eval", baseline_time),
+        ("single-pass", single_time),
+        ("single-pass, parallel", parallel_time),
+    ):
+        print(f"{label:<24}{seconds:>10.3f}{baseline_time / seconds:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
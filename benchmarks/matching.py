@@ -0,0 +1,145 @@
+"""
+Matching Benchmark
+
+Compares the original loop scoring every offering against every Amadeus hotel
+with the pruned matcher on a synthetic dataset and on hand-made edge cases.
+Both must give the same hotel ids and, for matched offerings, the same scores;
+an unmatched offering's pruned score may only be lower.
+
+Usage: python -m benchmarks.matching [--cities 3] [--hotels 200] [--repeat 1]
+"""
+import argparse
+import json
+import os
+import tempfile
+
+import pandas as pd
+from rapidfuzz import fuzz
+
+from address_parsing import parse_addresses
+from benchmarks.address_parsing import best_time
+from benchmarks.synthetic_data import cities, generate_dataset
+from matching import match_offerings, normalize
+from pipeline import hotels_frame
+
+
+def match_offerings_exhaustive(offerings, hotels, threshold=80):
+    """
+    The original approach: score every pair and keep the first best hotel
+    """
+    hotel_rows = [
+        (normalize(name), normalize(line), normalize(postal), hotel_id)
+        for name, line, postal, hotel_id in zip(
+            hotels["name"], hotels["address_line"], hotels["postal_code"], hotels["hotelId"]
+        )
+    ]
+    matched_ids, matched_scores = [], []
+    for name, street, postal in zip(
+        offerings["name"], offerings["street_address"], offerings["postal_code"]
+    ):
+        name, street, postal = normalize(name), normalize(street), normalize(postal)
+        best_score, best_hotel_id = 0, None
+        for hotel_name, hotel_line, hotel_postal, hotel_id in hotel_rows:
+            total_score = (
+                0.5 * fuzz.token_set_ratio(name, hotel_name)
+                + 0.4 * fuzz.token_set_ratio(street, hotel_line)
+                + 0.1 * (100 if postal and postal == hotel_postal else 0)
+            )
+            if total_score > best_score:
+                best_score, best_hotel_id = total_score, hotel_id
+        matched_ids.append(best_hotel_id if best_score >= threshold else None)
+        matched_scores.append(best_score)
+    return pd.DataFrame(
+        {"matched_hotel_id": matched_ids, "matched_hotel_score": matched_scores},
+        index=offerings.index,
+    )
+
+
+def edge_cases():
+    """
+    A misspelled name in another postal code, hotels in and outside an offering's postal
+    code competing for it, and an offering no hotel matches
+    """
+    offerings = pd.DataFrame(
+        {
+            "name": ["Marriott", "Harbor View Inn", "Zzyzx Lodge"],
+            "street_address": ["1 Main St", "20 Pier Rd", "9 Desert Way"],
+            "postal_code": ["02101", "02110", "99999"],
+        }
+    )
+    hotels = hotels_frame(
+        [
+            {"hotelId": "H1", "name": "MARIOTT",
+             "address": {"lines": ["1 MAIN ST"], "postalCode": "02102"}},
+            {"hotelId": "H2", "name": "HARBOR VIEW INN",
+             "address": {"lines": ["22 PIER RD"], "postalCode": "02110"}},
+            {"hotelId": "H3", "name": "HARBOUR VIEW INN",
+             "address": {"lines": ["20 PIER RD"], "postalCode": "02111"}},
+            {"hotelId": "H4", "name": "DESERT MOTEL",
+             "address": {"lines": ["9 DESERT WAY"], "postalCode": "88888"}},
+        ]
+    )
+    return offerings, hotels
+
+
+def compare(result, expected):
+    """
+    Returns the offerings where the pruned result differs from the exhaustive one
+    beyond what pruning allows
+    """
+    matched = expected["matched_hotel_id"].notnull()
+    same_ids = result["matched_hotel_id"].fillna("").eq(expected["matched_hotel_id"].fillna(""))
+    scores_ok = (result["matched_hotel_score"] == expected["matched_hotel_score"]) | (
+        ~matched & (result["matched_hotel_score"] <= expected["matched_hotel_score"])
+    )
+    return result.join(expected, rsuffix="_exhaustive")[~(same_ids & scores_ok)]
+
+
+def synthetic_cases(num_cities, hotels_per_city):
+    """
+    Returns (locality, offerings, hotels) for every city of a synthetic dataset
+    """
+    raw_dir = tempfile.mkdtemp(prefix="matching-benchmark-")
+    generate_dataset(raw_dir, num_cities, hotels_per_city, reviews_per_hotel=1)
+    offerings = pd.read_csv(os.path.join(raw_dir, "offerings.csv"))
+    offerings = offerings.join(parse_addresses(offerings["address"]))
+    with open(os.path.join(raw_dir, "amadeus_fixtures.json")) as f:
+        fixtures = json.load(f)
+    return [
+        (
+            locality,
+            offerings[offerings["locality"] == locality],
+            hotels_frame(fixtures["hotels"][iata_code]),
+        )
+        for locality, _, iata_code in cities(num_cities)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cities", type=int, default=3)
+    parser.add_argument("--hotels", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=1)
+    args = parser.parse_args()
+
+    cases = [("edge cases", *edge_cases())]
+    cases += synthetic_cases(args.cities, args.hotels)
+    print(f"{'case':<20}{'pairs':>10}{'exhaustive s':>14}{'pruned s':>11}{'speedup':>9}")
+    for label, offerings, hotels in cases:
+        exhaustive_time, expected = best_time(
+            lambda: match_offerings_exhaustive(offerings, hotels), args.repeat
+        )
+        pruned_time, result = best_time(
+            lambda: match_offerings(offerings, hotels), args.repeat
+        )
+        diff = compare(result, expected)
+        if not diff.empty:
+            raise SystemExit(f"{label}: pruned matches differ from the exhaustive loop\n{diff}")
+        print(
+            f"{label:<20}{len(offerings) * len(hotels):>10}{exhaustive_time:>14.3f}"
+            f"{pruned_time:>11.3f}{exhaustive_time / pruned_time:>8.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+"""
+Benchmark Suite
+
+Generates a synthetic dataset, starts the fake Amadeus and DeepSeek servers with
+the given latency, and times address parsing, the cache build, fuzzy matching,
+review sampling, pre-ranking, batch scoring and pricing. Results are printed and written as
+JSON with the commit they were measured on, so runs can be compared over time.
+
+Usage:
+    python -m benchmarks.suite --cities 5 --hotels 200 --reviews 50 \
+        --amadeus-latency 0.05 --deepseek-latency 0.5 --output benchmark.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from benchmarks.address_parsing import best_time
+from benchmarks.synthetic_data import cities, generate_dataset
+from fakes import amadeus_server, deepseek_server
+
+QUERY = "quiet, clean, good breakfast"
+
+
+def git_commit():
+    """
+    Returns the commit of the code being benchmarked, or None outside a git checkout
+    """
+    repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=repo_dir,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def result(seconds, rows, **extra):
+    """
+    Describes one benchmark: wall time, rows processed and throughput
+    """
+    return {
+        "seconds": round(seconds, 6),
+        "rows": rows,
+        "rows_per_second": round(rows / seconds, 1) if seconds else None,
+        **extra,
+    }
+
+
+def bench_address_parsing(raw_dir, repeat):
+    from address_parsing import parse_addresses
+
+    addresses = pd.read_csv(os.path.join(raw_dir, "offerings.csv"), usecols=["address"])[
+        "address"
+    ]
+    single, _ = best_time(lambda: parse_addresses(addresses), repeat)
+    parallel, _ = best_time(lambda: parse_addresses(addresses, workers=None), repeat)
+    return {
+        "address_parsing": result(single, len(addresses)),
+        "address_parsing_parallel": result(parallel, len(addresses)),
+    }
+
+
+def bench_cache_build(raw_dir, cache_dir, num_offerings):
+    from data_cache import build_cache
+
+    start = time.perf_counter()
+    build_cache(raw_dir, cache_dir)
+    seconds = time.perf_counter() - start
+    return {"cache_build": result(seconds, num_offerings)}
+
+
+def bench_matching(cache_dir, fixtures, num_cities, repeat):
+    from data_cache import load_offerings
+    from matching import match_offerings
+    from pipeline import hotels_frame
+
+    offerings = load_offerings(cache_dir=cache_dir).dropna(
+        subset=["street_address", "postal_code"]
+    )
+    pairs = [
+        (
+            offerings[offerings["locality"] == locality],
+            hotels_frame(fixtures["hotels"][iata_code]),
+        )
+        for locality, _, iata_code in cities(num_cities)
+    ]
+
+    def match_all():
+        return [match_offerings(subset, hotels) for subset, hotels in pairs]
+
+    seconds, matches = best_time(match_all, repeat)
+    matched = sum(int(m["matched_hotel_id"].notnull().sum()) for m in matches)
+    return {
+        "fuzzy_matching": result(
+            seconds,
+            len(offerings),
+            comparisons=sum(len(subset) * len(hotels) for subset, hotels in pairs),
+            matched=matched,
+        )
+    }
+
+
+def bench_review_sampling(cache_dir, repeat):
+    from data_cache import load_offerings, open_review_index
+
+    offering_ids = load_offerings(columns=["id"], cache_dir=cache_dir)["id"].tolist()
+    review_index = open_review_index(cache_dir)
+
+    def sample_index():
+        return {i: review_index.sample(i, 10, seed=f"0:{i}") for i in offering_ids}
+
+    index_seconds, samples = best_time(sample_index, repeat)
+    sampled = sum(len(s) for s in samples.values())
+    return {
+        "review_sampling_index": result(index_seconds, len(offering_ids), reviews=sampled),
+    }, [{"hotel_id": str(i), "reviews": s} for i, s in samples.items()]
+
+
+def bench_pre_ranking(cache_dir, repeat):
+    from data_cache import open_review_ranker
+
+    ranker = open_review_ranker(cache_dir)
+    seconds, _ = best_time(lambda: ranker.rank(QUERY, ranker.offering_ids), repeat)
+    return {"pre_ranking": result(seconds, len(ranker.offering_ids))}
+
+
+def bench_batch_scoring(records, work_dir):
+    import deepseek_enrichment
+    from llm_cache import ResponseCache
+
+    cache = ResponseCache(path=os.path.join(work_dir, "llm_cache.sqlite"))
+    runs = {}
+    for label in ("batch_scoring_cold", "batch_scoring_cached"):
+        calls_before = deepseek_enrichment.api_calls
+        start = time.perf_counter()
+        scored = deepseek_enrichment.find_best_hotels(records, QUERY, cache=cache)
+        seconds = time.perf_counter() - start
+        runs[label] = result(
+            seconds,
+            len(records),
+            requests=deepseek_enrichment.api_calls - calls_before,
+            scored=len(scored),
+        )
+    return runs
+
+
+def bench_pricing(fixtures, work_dir, num_hotels):
+    from amadeus_client import AmadeusGateway, ReferenceCache
+    from pricing import fetch_prices
+
+    hotel_ids = [
+        h["hotelId"] for hotels in fixtures["hotels"].values() for h in hotels
+    ][:num_hotels]
+    gateway = AmadeusGateway(cache=ReferenceCache(os.path.join(work_dir, "amadeus.sqlite")))
+    runs = {}
+    for label in ("pricing_cold", "pricing_cached"):
+        calls_before = gateway.calls
+        start = time.perf_counter()
+        prices, unavailable = fetch_prices(gateway, hotel_ids, "2030-01-01", "2030-01-02")
+        seconds = time.perf_counter() - start
+        runs[label] = result(
+            seconds,
+            len(hotel_ids),
+            requests=gateway.calls - calls_before,
+            priced=sum(1 for p in prices.values() if p),
+            unavailable=len(unavailable),
+        )
+    return runs
+
+
+def run_suite(args, work_dir):
+    raw_dir = os.path.join(work_dir, "raw")
+    cache_dir = os.path.join(work_dir, "cache")
+    dataset = generate_dataset(
+        raw_dir, args.cities, args.hotels, args.reviews, seed=args.seed
+    )
+    with open(os.path.join(raw_dir, "amadeus_fixtures.json")) as f:
+        fixtures = json.load(f)
+
+    amadeus = amadeus_server.start_server(latency=args.amadeus_latency, fixtures=fixtures)
+    deepseek = deepseek_server.start_server(latency=args.deepseek_latency)
+    # The project modules read these when imported or when creating clients
+    os.environ.update(
+        {
+            "AMADEUS_HOST": "127.0.0.1",
+            "AMADEUS_PORT": str(amadeus.server_port),
+            "AMADEUS_SSL": "false",
+            "AMADEUS_CLIENT_ID": "benchmark",
+            "AMADEUS_CLIENT_SECRET": "benchmark",
+            "DEEPSEEK_BASE_URL": f"http://127.0.0.1:{deepseek.server_port}",
+            "DEEPSEEK_API_KEY": "benchmark",
+        }
+    )
+    try:
+        benchmarks = {}
+        benchmarks.update(bench_address_parsing(raw_dir, args.repeat))
+        benchmarks.update(bench_cache_build(raw_dir, cache_dir, dataset["offerings"]))
+        benchmarks.update(bench_matching(cache_dir, fixtures, args.cities, args.repeat))
+        sampling, records = bench_review_sampling(cache_dir, args.repeat)
+        benchmarks.update(sampling)
+        benchmarks.update(bench_pre_ranking(cache_dir, args.repeat))
+        benchmarks.update(bench_batch_scoring(records[: args.scored_hotels], work_dir))
+        benchmarks.update(bench_pricing(fixtures, work_dir, args.priced_hotels))
+    finally:
+        amadeus.shutdown()
+        deepseek.shutdown()
+    return dataset, benchmarks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the recommender benchmark suite")
+    parser.add_argument("--cities", type=int, default=5)
+    parser.add_argument("--hotels", type=int, default=200, help="Hotels per city")
+    parser.add_argument("--reviews", type=int, default=50, help="Average reviews per hotel")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per CPU benchmark; the fastest counts")
+    parser.add_argument("--amadeus-latency", type=float, default=0.05)
+    parser.add_argument("--deepseek-latency", type=float, default=0.5)
+    parser.add_argument("--scored-hotels", type=int, default=200, help="Hotels sent to the LLM")
+    parser.add_argument("--priced-hotels", type=int, default=50)
+    parser.add_argument("--output", default="benchmark.json")
+    parser.add_argument("--work-dir", help="Keep the generated data here instead of a temp dir")
+    args = parser.parse_args()
+
+    if args.work_dir:
+        dataset, benchmarks = run_suite(args, args.work_dir)
+    else:
+        with tempfile.TemporaryDirectory() as work_dir:
+            dataset, benchmarks = run_suite(args, work_dir)
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "params": {
+            key: value
+            for key, value in vars(args).items()
+            if key not in ("output", "work_dir")
+        },
+        "dataset": dataset,
+        "benchmarks": benchmarks,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\n{'benchmark':<28}{'seconds':>10}{'rows':>10}{'rows/s':>12}")
+    for name, bench in benchmarks.items():
+        print(
+            f"{name:<28}{bench['seconds']:>10.3f}{bench['rows']:>10}"
+            f"{bench['rows_per_second'] or 0:>12.1f}"
+        )
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""
+Synthetic Dataset Generator
+
+Writes offerings.csv and reviews.csv in the layout of the Kaggle TripAdvisor
+dataset, plus a fixture file for fakes/amadeus_server.py whose hotels partly
+match the offerings, at a configurable scale of cities x hotels x reviews.
+The same seed always produces the same files.
+
+Usage:
+    python -m benchmarks.synthetic_data out_dir --cities 5 --hotels 200 --reviews 50
+"""
+import argparse
+import csv
+import json
+import os
+import random
+
+CITIES = [
+    ("Boston", "MA", "BOS"),
+    ("New York City", "NY", "NYC"),
+    ("Chicago", "IL", "CHI"),
+    ("San Francisco", "CA", "SFO"),
+    ("Seattle", "WA", "SEA"),
+    ("Houston", "TX", "HOU"),
+    ("Miami", "FL", "MIA"),
+    ("Denver", "CO", "DEN"),
+    ("Atlanta", "GA", "ATL"),
+    ("Phoenix", "AZ", "PHX"),
+]
+NAME_PREFIXES = ["Grand", "Hotel", "Inn at", "The", "Residence", "Suites at", "Park"]
+NAME_WORDS = [
+    "Harbor", "Plaza", "Central", "Riverside", "Union", "Liberty", "Summit",
+    "Garden", "Station", "Capitol", "Beacon", "Lakeside", "Market", "Heritage",
+]
+BRANDS = ["", "Marriott", "Hilton", "Hyatt", "Sheraton", "Westin", "Holiday Inn"]
+STREETS = ["Main St", "Broadway", "Market St", "Park Ave", "O'Farrell St", "1st Ave"]
+REVIEW_WORDS = [
+    "clean", "quiet", "friendly", "staff", "breakfast", "room", "location", "noisy",
+    "small", "spacious", "pool", "gym", "view", "bed", "comfortable", "parking",
+    "wifi", "walking", "distance", "great", "terrible", "value", "service", "lobby",
+]
+RATING_ASPECTS = ["service", "cleanliness", "overall", "value", "location", "sleep_quality", "rooms"]
+MONTHS = [
+    "January", "February", "March", "April", "May", "June", "July",
+    "August", "September", "October", "November", "December",
+]
+
+OFFERINGS_COLUMNS = [
+    "hotel_class", "region_id", "url", "phone", "details", "address", "type", "id", "name",
+]
+REVIEWS_COLUMNS = [
+    "ratings", "title", "text", "author", "date_stayed", "offering_id",
+    "num_helpful_votes", "date", "id", "via_mobile",
+]
+
+
+def cities(count):
+    """
+    Returns (locality, region, iata_code) for count cities, inventing some past the known ones
+    """
+    known = CITIES[:count]
+    extra = [
+        (f"Springfield {i}", "IL", f"Z{chr(65 + i // 26 % 26)}{chr(65 + i % 26)}")
+        for i in range(count - len(known))
+    ]
+    return known + extra
+
+
+def _hotel_name(rng):
+    name = f"{rng.choice(NAME_PREFIXES)} {rng.choice(NAME_WORDS)} {rng.choice(NAME_WORDS)}"
+    brand = rng.choice(BRANDS)
+    return f"{name} {brand}".strip()
+
+
+def _amadeus_name(rng, name):
+    """
+    Writes an offering name the way Amadeus might: uppercased and sometimes abbreviated
+    """
+    name = name.upper()
+    if rng.random() < 0.3:
+        name = name.replace("HOTEL ", "").replace("THE ", "")
+    if rng.random() < 0.2:
+        name += " & SUITES"
+    return name
+
+
+def _review(rng, review_id, offering_id):
+    words = rng.randint(20, 200)
+    overall = float(rng.randint(1, 5))
+    ratings = {
+        aspect: float(max(1, min(5, overall + rng.randint(-1, 1))))
+        for aspect in rng.sample(RATING_ASPECTS, rng.randint(2, len(RATING_ASPECTS)))
+    }
+    ratings["overall"] = overall
+    year = rng.randint(2003, 2012)
+    return {
+        "ratings": repr(ratings),
+        "title": " ".join(rng.choices(REVIEW_WORDS, k=rng.randint(2, 6))).capitalize(),
+        "text": " ".join(rng.choices(REVIEW_WORDS, k=words)),
+        "author": f"traveler{rng.randint(1, 10**6)}",
+        "date_stayed": f"{rng.choice(MONTHS)} {year}",
+        "offering_id": offering_id,
+        "num_helpful_votes": rng.randint(0, 20),
+        "date": f"{rng.choice(MONTHS)} {rng.randint(1, 28)}, {year}",
+        "id": review_id,
+        "via_mobile": rng.random() < 0.1,
+    }
+
+
+def generate_dataset(
+    out_dir,
+    num_cities=5,
+    hotels_per_city=200,
+    reviews_per_hotel=50,
+    match_rate=0.7,
+    seed=0,
+):
+    """
+    Writes offerings.csv, reviews.csv and amadeus_fixtures.json to out_dir.
+    Review counts vary per hotel around reviews_per_hotel; match_rate of the offerings
+    also exist as Amadeus hotels. Returns the summary of what was written.
+    """
+    rng = random.Random(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    fixtures = {"cities": {}, "hotels": {}}
+    offering_ids = []
+
+    with open(os.path.join(out_dir, "offerings.csv"), "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=OFFERINGS_COLUMNS)
+        writer.writeheader()
+        offering_id = 1000
+        for locality, region, iata_code in cities(num_cities):
+            fixtures["cities"][locality.lower()] = [
+                {
+                    "type": "location",
+                    "subType": "city",
+                    "name": locality.upper(),
+                    "iataCode": iata_code,
+                    "address": {"countryCode": "US", "stateCode": region},
+                }
+            ]
+            hotels = fixtures["hotels"][iata_code] = []
+            for _ in range(hotels_per_city):
+                offering_id += 1
+                name = _hotel_name(rng)
+                street = f"{rng.randint(1, 2000)} {rng.choice(STREETS)}"
+                postal = f"{rng.randint(10000, 99999)}"
+                address = {"region": region, "street-address": street, "locality": locality}
+                # Some offerings lack a postal code, like in the real data
+                if rng.random() < 0.95:
+                    address["postal-code"] = postal
+                writer.writerow(
+                    {
+                        "hotel_class": rng.choice(["", "2.0", "3.0", "3.5", "4.0", "5.0"]),
+                        "region_id": rng.randint(1, 10**5),
+                        "url": f"http://www.tripadvisor.com/Hotel_Review-d{offering_id}",
+                        "phone": "",
+                        "details": "",
+                        "address": repr(address),
+                        "type": "hotel",
+                        "id": offering_id,
+                        "name": name,
+                    }
+                )
+                offering_ids.append(offering_id)
+                if rng.random() < match_rate:
+                    hotels.append(
+                        {
+                            "chainCode": "XX",
+                            "iataCode": iata_code,
+                            "name": _amadeus_name(rng, name),
+                            "hotelId": f"XX{iata_code}{offering_id}",
+                            "address": {
+                                "lines": [street.upper()],
+                                "postalCode": postal,
+                                "countryCode": "US",
+                            },
+                        }
+                    )
+            # Amadeus also lists hotels that are not in the dataset
+            for i in range(hotels_per_city // 5):
+                hotels.append(
+                    {
+                        "chainCode": "YY",
+                        "iataCode": iata_code,
+                        "name": _hotel_name(rng).upper(),
+                        "hotelId": f"YY{iata_code}{i:05d}",
+                        "address": {
+                            "lines": [f"{rng.randint(1, 2000)} {rng.choice(STREETS)}".upper()],
+                            "postalCode": f"{rng.randint(10000, 99999)}",
+                            "countryCode": "US",
+                        },
+                    }
+                )
+
+    num_reviews = 0
+    with open(os.path.join(out_dir, "reviews.csv"), "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=REVIEWS_COLUMNS)
+        writer.writeheader()
+        for offering_id in offering_ids:
+            for _ in range(rng.randint(0, 2 * reviews_per_hotel)):
+                writer.writerow(_review(rng, num_reviews, offering_id))
+                num_reviews += 1
+
+    with open(os.path.join(out_dir, "amadeus_fixtures.json"), "w") as f:
+        json.dump(fixtures, f)
+
+    return {
+        "cities": num_cities,
+        "offerings": len(offering_ids),
+        "reviews": num_reviews,
+        "amadeus_hotels": sum(len(h) for h in fixtures["hotels"].values()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic hotel reviews dataset")
+    parser.add_argument("out_dir")
+    parser.add_argument("--cities", type=int, default=5)
+    parser.add_argument("--hotels", type=int, default=200, help="Hotels per city")
+    parser.add_argument("--reviews", type=int, default=50, help="Average reviews per hotel")
+    parser.add_argument("--match-rate", type=float, default=0.7)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    summary = generate_dataset(
+        args.out_dir, args.cities, args.hotels, args.reviews, args.match_rate, args.seed
+    )
+    print(json.dumps(summary))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Data Acquisition Module
+
+Downloads the TripAdvisor dataset archive from Kaggle only when it is missing
+or Kaggle has published a different version, and supports running offline
+"""
+import json
+import os
+import time
+
+from data_cache import ARCHIVE_NAME, RAW_DIR, SOURCE_FILES
+
+DATASET = "joebeachcapital/hotel-reviews"
+MANIFEST_NAME = "dataset_manifest.json"
+
+# Set HOTEL_OFFLINE=1 to never contact Kaggle
+OFFLINE = os.getenv("HOTEL_OFFLINE", "").lower() in ("1", "true", "yes")
+# How often Kaggle is asked whether a new dataset version was published
+CHECK_INTERVAL = 24 * 60 * 60
+
+
+def _read_manifest(raw_dir):
+    path = os.path.join(raw_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_manifest(raw_dir, manifest):
+    with open(os.path.join(raw_dir, MANIFEST_NAME), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+
+def _has_local_data(raw_dir):
+    """
+    Checks for the dataset archive, downloaded or placed there by hand, or unzipped CSVs
+    """
+    if os.path.exists(os.path.join(raw_dir, ARCHIVE_NAME)):
+        return True
+    return all(
+        os.path.exists(os.path.join(raw_dir, name))
+        for name in SOURCE_FILES
+    )
+
+
+def _kaggle_api():
+    """
+    Imports kaggle lazily, since importing it authenticates against Kaggle
+    (and exits when no credentials are configured)
+    """
+    import kaggle
+
+    kaggle.api.authenticate()
+    return kaggle.api
+
+
+def remote_version(api):
+    """
+    Describes the published dataset by the name, size and creation date of its files
+    """
+    files = api.dataset_list_files(DATASET).files
+    return sorted(
+        [
+            {
+                "name": str(getattr(f, "name", "")),
+                "size": getattr(f, "total_bytes", None) or getattr(f, "size", None),
+                "created": str(
+                    getattr(f, "creation_date", None) or getattr(f, "creationDate", "")
+                ),
+            }
+            for f in files
+        ],
+        key=lambda f: f["name"],
+    )
+
+
+def acquire_dataset(raw_dir=RAW_DIR, offline=OFFLINE):
+    """
+    Makes sure the dataset is available locally, downloading the archive only when it is
+    missing or stale. Offline, or when Kaggle cannot be reached, local data is used as is.
+    """
+    os.makedirs(raw_dir, exist_ok=True)
+    manifest = _read_manifest(raw_dir)
+    has_local = _has_local_data(raw_dir)
+
+    if offline:
+        if not has_local:
+            raise RuntimeError(
+                f"Offline mode is on but no dataset was found in {raw_dir}. "
+                f"Run once online or place {ARCHIVE_NAME} (or offerings.csv and "
+                "reviews.csv) there."
+            )
+        print("Offline mode: using local dataset.")
+        return
+    if has_local and time.time() - manifest.get("checked_at", 0) < CHECK_INTERVAL:
+        return
+
+    try:
+        api = _kaggle_api()
+        version = remote_version(api)
+    except (Exception, SystemExit) as e:
+        if has_local:
+            print(f"Could not reach Kaggle ({e!r}). Using local dataset.")
+            return
+        raise
+
+    if has_local and manifest.get("files") == version:
+        manifest["checked_at"] = time.time()
+        _write_manifest(raw_dir, manifest)
+        return
+
+    print(f"Downloading dataset {DATASET}...")
+    api.dataset_download_files(DATASET, path=raw_dir, force=True, unzip=False)
+    _write_manifest(
+        raw_dir,
+        {"dataset": DATASET, "files": version, "checked_at": time.time()},
+    )
@@ -0,0 +1,265 @@
+"""
+Data Cache Module
+
+Ingests the raw TripAdvisor CSVs once into a typed Parquet store and loads
+only the columns and locality partitions that a run needs
+"""
+import hashlib
+import json
+import os
+import shutil
+import zipfile
+from contextlib import contextmanager
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from address_parsing import parse_addresses
+from rating_aggregates import RATINGS_NAME, RatingTable, build_rating_table
+from review_index import ReviewIndex, build_review_index
+from review_ranking import ReviewRanker, build_review_vectors
+
+RAW_DIR = os.path.join("data", "raw")
+CACHE_DIR = os.path.join("data", "cache")
+MANIFEST_NAME = "manifest.json"
+OFFERINGS_NAME = "offerings.parquet"
+REVIEWS_NAME = "reviews"
+
+# Bump whenever the layout or dtypes of the cached files change
+SCHEMA_VERSION = 5
+
+SOURCE_FILES = ("offerings.csv", "reviews.csv")
+# The Kaggle download; when present the CSVs are streamed straight out of it
+ARCHIVE_NAME = "hotel-reviews.zip"
+REVIEWS_CHUNK_SIZE = 200_000
+
+OFFERINGS_DTYPES = {"id": "int64", "name": "string", "address": "string"}
+# Parsed address fields shared by many offerings are stored dictionary encoded and
+# load as pandas categoricals
+OFFERINGS_CATEGORIES = ("locality", "region", "postal_code")
+REVIEWS_DTYPES = {
+    "offering_id": "int64",
+    "title": "string",
+    "text": "string",
+    "ratings": "string",
+    "author": "string",
+    "date": "string",
+    "date_stayed": "string",
+    "id": "int64",
+}
+
+
+def file_checksum(path, block_size=1 << 20):
+    """
+    Computes the sha256 checksum of a file without reading it into memory at once
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def fingerprint(path, previous=None):
+    """
+    Returns size, mtime and checksum of a source file.
+    The checksum is reused when size and mtime match the previous fingerprint.
+    """
+    stat = os.stat(path)
+    fingerprint = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    if (
+        previous
+        and previous.get("size") == fingerprint["size"]
+        and previous.get("mtime_ns") == fingerprint["mtime_ns"]
+    ):
+        fingerprint["sha256"] = previous["sha256"]
+    else:
+        fingerprint["sha256"] = file_checksum(path)
+    return fingerprint
+
+
+def read_manifest(cache_dir=CACHE_DIR):
+    """
+    Loads the cache manifest, or None if the cache has not been built
+    """
+    path = os.path.join(cache_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def _sources(raw_dir):
+    """
+    Returns the source files of the cache: the dataset archive if present, otherwise the CSVs
+    """
+    archive = os.path.join(raw_dir, ARCHIVE_NAME)
+    if os.path.exists(archive):
+        return {ARCHIVE_NAME: archive}
+    return {name: os.path.join(raw_dir, name) for name in SOURCE_FILES}
+
+
+@contextmanager
+def open_csv(raw_dir, name):
+    """
+    Opens a CSV from the dataset archive without extracting it, or from raw_dir
+    """
+    archive = os.path.join(raw_dir, ARCHIVE_NAME)
+    if not os.path.exists(archive):
+        yield os.path.join(raw_dir, name)
+        return
+    with zipfile.ZipFile(archive) as zf:
+        member = next(m for m in zf.namelist() if os.path.basename(m) == name)
+        with zf.open(member) as f:
+            yield f
+
+
+def _csv_dtypes(raw_dir, name, dtypes):
+    """
+    Restricts dtypes to the columns the source CSV actually has
+    """
+    with open_csv(raw_dir, name) as source:
+        header = pd.read_csv(source, nrows=0).columns
+    return {col: dt for col, dt in dtypes.items() if col in header}
+
+
+def is_cache_current(raw_dir=RAW_DIR, cache_dir=CACHE_DIR):
+    """
+    Checks whether the cache was built from the current raw data
+    """
+    manifest = read_manifest(cache_dir)
+    if not manifest or manifest.get("schema_version") != SCHEMA_VERSION:
+        return False
+    sources = _sources(raw_dir)
+    if set(sources) != set(manifest.get("sources", {})):
+        return False
+    for name, path in sources.items():
+        previous = manifest["sources"][name]
+        if not os.path.exists(path):
+            return False
+        if fingerprint(path, previous)["sha256"] != previous["sha256"]:
+            return False
+    return True
+
+
+def _build_offerings(raw_dir, build_dir):
+    """
+    Writes offerings with parsed address fields to a single Parquet file
+    """
+    dtype = _csv_dtypes(raw_dir, "offerings.csv", OFFERINGS_DTYPES)
+    with open_csv(raw_dir, "offerings.csv") as source:
+        offerings_df = pd.read_csv(source, dtype=dtype)
+    offerings_df = offerings_df.join(
+        parse_addresses(offerings_df["address"], workers=None).astype(
+            {col: "category" for col in OFFERINGS_CATEGORIES}
+        )
+    )
+    offerings_df.to_parquet(os.path.join(build_dir, OFFERINGS_NAME), index=False)
+    return offerings_df
+
+
+def _build_reviews(raw_dir, build_dir, locality_by_id):
+    """
+    Streams reviews.csv in chunks into a Parquet dataset partitioned by locality
+    """
+    reviews_dir = os.path.join(build_dir, REVIEWS_NAME)
+    dtype = _csv_dtypes(raw_dir, "reviews.csv", REVIEWS_DTYPES)
+    with open_csv(raw_dir, "reviews.csv") as source:
+        reader = pd.read_csv(source, dtype=dtype, chunksize=REVIEWS_CHUNK_SIZE)
+        for n, chunk in enumerate(reader):
+            chunk["locality"] = chunk["offering_id"].map(locality_by_id).astype("string")
+            pq.write_to_dataset(
+                pa.Table.from_pandas(chunk, preserve_index=False),
+                root_path=reviews_dir,
+                partition_cols=["locality"],
+                basename_template=f"part-{n}-{{i}}.parquet",
+                existing_data_behavior="overwrite_or_ignore",
+            )
+
+
+def build_cache(raw_dir=RAW_DIR, cache_dir=CACHE_DIR):
+    """
+    Ingests offerings.csv and reviews.csv, from the dataset archive if present, into the
+    columnar cache.
+    The cache is built next to the old one and swapped in once complete.
+    """
+    previous = (read_manifest(cache_dir) or {}).get("sources", {})
+    sources = {
+        name: fingerprint(path, previous.get(name))
+        for name, path in _sources(raw_dir).items()
+    }
+
+    build_dir = cache_dir.rstrip(os.sep) + ".building"
+    shutil.rmtree(build_dir, ignore_errors=True)
+    os.makedirs(build_dir)
+
+    print("Building columnar data cache. This only happens when the raw data changes...")
+    offerings_df = _build_offerings(raw_dir, build_dir)
+    locality_by_id = offerings_df.set_index("id")["locality"]
+    _build_reviews(raw_dir, build_dir, locality_by_id)
+    build_review_index(os.path.join(build_dir, REVIEWS_NAME), build_dir)
+    build_review_vectors(build_dir)
+    build_rating_table(
+        os.path.join(build_dir, REVIEWS_NAME), os.path.join(build_dir, RATINGS_NAME)
+    )
+
+    with open(os.path.join(build_dir, MANIFEST_NAME), "w") as f:
+        json.dump({"schema_version": SCHEMA_VERSION, "sources": sources}, f, indent=2)
+
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    os.replace(build_dir, cache_dir)
+    print(f"Data cache written to {cache_dir}")
+
+
+def ensure_cache(raw_dir=RAW_DIR, cache_dir=CACHE_DIR):
+    """
+    Rebuilds the cache if it is missing or the raw data has changed
+    """
+    if not is_cache_current(raw_dir, cache_dir):
+        build_cache(raw_dir, cache_dir)
+
+
+def _locality_filter(localities):
+    """
+    Builds a pyarrow filter expression for a list of localities
+    """
+    if localities is None:
+        return None
+    return ds.field("locality").isin(list(localities))
+
+
+def load_offerings(columns=None, localities=None, cache_dir=CACHE_DIR):
+    """
+    Loads offerings from the cache, optionally restricted to columns and localities.
+    Strings load as Arrow-backed pandas strings rather than Python objects.
+    """
+    table = pq.read_table(
+        os.path.join(cache_dir, OFFERINGS_NAME),
+        columns=columns,
+        filters=_locality_filter(localities),
+        memory_map=True,
+    )
+    return table.to_pandas(types_mapper={pa.string(): pd.StringDtype("pyarrow")}.get)
+
+
+def open_review_index(cache_dir=CACHE_DIR):
+    """
+    Opens the review index stored with the cache
+    """
+    return ReviewIndex(cache_dir)
+
+
+def open_review_ranker(cache_dir=CACHE_DIR):
+    """
+    Opens the BM25 review ranking index stored with the cache
+    """
+    return ReviewRanker(cache_dir)
+
+
+def open_rating_table(cache_dir=CACHE_DIR):
+    """
+    Opens the per-hotel rating aggregates stored with the cache
+    """
+    return RatingTable(os.path.join(cache_dir, RATINGS_NAME))
@@ -6,18 +6,52 @@ Enriches the data by using the deepseek AI API
 import json
 from openai import OpenAI
 import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from batch_planner import estimate_tokens, fit_record, plan_batches, record_tokens
+from llm_cache import ResponseCache, cache_key
+from rate_limit import TokenBucket
 
 DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
+# Point this at fakes/deepseek_server.py to run without a DeepSeek account
+DEEPSEEK_BASE_URL = os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com")
+
+# Batches sent to deepseek at the same time
+MAX_CONCURRENCY = int(os.getenv("DEEPSEEK_MAX_CONCURRENCY", "4"))
+# Retries per batch, waiting RETRY_BACKOFF seconds doubled on every attempt
+MAX_RETRIES = 3
+RETRY_BACKOFF = 1.0
+
+MODEL = "deepseek-chat"
+
+# Estimated prompt tokens per request, including the system prompt and query
+TOKEN_BUDGET = int(os.getenv("DEEPSEEK_TOKEN_BUDGET", "32000"))
+# Hotels per request are capped so the JSON answer stays within the output limit
+MAX_BATCH_HOTELS = 40
+
+# Requests per second sent to deepseek by all threads; 0 means unlimited.
+# Batch mode replaces rate_limiter with one shared by all of its processes.
+RATE_LIMIT = float(os.getenv("DEEPSEEK_RATE_LIMIT", "0"))
+rate_limiter = TokenBucket(RATE_LIMIT, MAX_CONCURRENCY) if RATE_LIMIT else None
+
+# Requests sent to deepseek by this process, counting retries
+api_calls = 0
+_api_calls_lock = threading.Lock()
 
+# Retries are handled per batch by find_best_hotels
 client = OpenAI(
     api_key=DEEPSEEK_API_KEY,
-    base_url="https://api.deepseek.com",
+    base_url=DEEPSEEK_BASE_URL,
+    max_retries=0,
 )
 
 system_prompt = """
 You are an expert hotel review analyst. The user will provide aspects that they are looking for in a hotel as well as an array of hotels to analyze.
 Analyze the provided hotel reviews and return a score of how well the hotel matches their query from 0 to 100 with 2 decimal places as well as key points from the reviews.
-For each hotel, consider both the review content and the ratings if available. 
+For each hotel, consider both the review content and the ratings if available. "ratings" holds the hotel's mean rating per aspect over all of its reviews, "recent_overall" weighs recent reviews more and "num_ratings" is how many reviews rated the hotel.
 Return the result as a JSON object matching the example below
 
 EXAMPLE INPUT:
@@ -26,7 +60,8 @@ Hotel Reviews:
 [
     {
         "hotel_id": "YXNYCCAS",
-        "reviews": [{\'title\': \'“Fab pad in Times Square”\', \'text\': \'We had a whisper-quiet queen deluxe room coutyard room for 7 nights in November 2012. This hotel is clean, comfortable and so central to theatres and subway lines. The staff are friendly, efficient and professional. The breakfast room with tea and coffee, fruits and pastries available all day was a really a homely place to retire to after a long day shopping or just before running out to an evening show. With free wi-fi to top it all off, what more could one want?\', \'rating\': \'{\'service\': 5.0, \'cleanliness\': 5.0, \'overall\': 5.0, \'value\': 5.0, \'location\': 5.0, \'sleep_quality\': 5.0, \'rooms\': 5.0}\'}, {\'title\': \'“This is how you run a hotel”\', \'text\': \'Great 3 night stay right after Thanksgiving. Agree with all previous reviews on all points. The Casablanca proves that you don\'t need to be the biggest, newest or fanciest hotel to give your guests an amazing stay. This was a business trip for us, the hotel suited us well as business travelers and tourists alike. Complimentary wifi worked well for our entire stay, our room was a little small and had a table vs a desk and made it hard to work from the room for long periods but we ended up working from Rick\'s Cafe for a couple hours in the evening. Our room was in the back of the hotel and was very very quiet. Great staff and clean rooms. We will be back\', \'rating\': \'{\'service\': 5.0, \'cleanliness\': 5.0, \'overall\': 5.0, \'value\': 5.0, \'location\': 5.0, \'sleep_quality\': 5.0, \'rooms\': 4.0}\'}]
+        "ratings": {"overall": 4.6, "service": 4.8, "cleanliness": 4.7, "value": 4.4, "location": 4.9, "sleep_quality": 4.5, "rooms": 4.2, "recent_overall": 4.7, "num_ratings": 312},
+        "reviews": [{\'title\': \'“Fab pad in Times Square”\', \'text\': \'We had a whisper-quiet queen deluxe room coutyard room for 7 nights in November 2012. This hotel is clean, comfortable and so central to theatres and subway lines. The staff are friendly, efficient and professional. The breakfast room with tea and coffee, fruits and pastries available all day was a really a homely place to retire to after a long day shopping or just before running out to an evening show. With free wi-fi to top it all off, what more could one want?\'}, {\'title\': \'“This is how you run a hotel”\', \'text\': \'Great 3 night stay right after Thanksgiving. Agree with all previous reviews on all points. The Casablanca proves that you don\'t need to be the biggest, newest or fanciest hotel to give your guests an amazing stay. This was a business trip for us, the hotel suited us well as business travelers and tourists alike. Complimentary wifi worked well for our entire stay, our room was a little small and had a table vs a desk and made it hard to work from the room for long periods but we ended up working from Rick\'s Cafe for a couple hours in the evening. Our room was in the back of the hotel and was very very quiet. Great staff and clean rooms. We will be back\'}]
     }
 ]
 
@@ -40,31 +75,139 @@ EXAMPLE JSON OUTPUT:
 ]
 """
 
+# Bump whenever system_prompt changes so scores cached for the old prompt are not reused
+SYSTEM_PROMPT_VERSION = 2
 
-def find_best_hotels(hotel_samples, user_query, batch_size=20):
+response_cache = ResponseCache()
+
+
+def _parse_results(content):
     """
-    Prompts the deepseek AI to analyze and hotel reviews and return the top 10 matching the user's query
+    Parses the hotel array out of a model response.
+    JSON mode may wrap the array in an object, in which case its first list value is used.
     """
-    try:
-        res = []
-        n = len(hotel_samples)
-        for i in range(0, n, batch_size):
-            batch = hotel_samples[i : i + batch_size]
-            user_prompt = (
-                f"User Query: {user_query}\nHotel Reviews:\n{json.dumps(batch)}"
-            )
-            messages = [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ]
+    parsed = json.loads(content)
+    if isinstance(parsed, dict):
+        parsed = next((v for v in parsed.values() if isinstance(v, list)), [])
+    return parsed
+
+
+def _user_prompt(user_query, batch):
+    """
+    Builds the user message for a batch of hotels
+    """
+    return f"User Query: {user_query}\nHotel Reviews:\n{json.dumps(batch)}"
+
+
+def _score_batch(batch, user_query, max_retries, retry_backoff):
+    """
+    Sends one batch of hotels to deepseek, retrying failed requests with exponential backoff
+    """
+    global api_calls
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": _user_prompt(user_query, batch)},
+    ]
+    for attempt in range(max_retries + 1):
+        if rate_limiter is not None:
+            rate_limiter.acquire()
+        with _api_calls_lock:
+            api_calls += 1
+        try:
             response = client.chat.completions.create(
-                model="deepseek-chat",
+                model=MODEL,
                 messages=messages,
                 response_format={"type": "json_object"},
             )
+            return _parse_results(response.choices[0].message.content)
+        except Exception as e:
+            if attempt == max_retries:
+                raise
+            delay = retry_backoff * 2**attempt * (1 + random.random())
+            print(f"DeepSeek batch failed ({e}), retrying in {delay:.1f}s...")
+            time.sleep(delay)
+
+
+def find_best_hotels(
+    hotel_samples,
+    user_query,
+    token_budget=TOKEN_BUDGET,
+    max_batch_hotels=MAX_BATCH_HOTELS,
+    max_concurrency=MAX_CONCURRENCY,
+    max_retries=MAX_RETRIES,
+    retry_backoff=RETRY_BACKOFF,
+    cache=response_cache,
+    on_results=None,
+):
+    """
+    Prompts the deepseek AI to analyze and hotel reviews and return the top 10 matching the user's query.
+    Hotels already scored for the same query and reviews come from the cache; the rest are packed
+    into batches of at most token_budget estimated prompt tokens and sent with up to max_concurrency
+    batches in flight. Results are returned in the order of hotel_samples and a batch that still
+    fails after its retries is left out instead of failing the whole run.
+    If given, on_results is called with the cached results first and then with each batch's
+    results as soon as that batch returns, always from the calling thread.
+    """
+    overhead = estimate_tokens(system_prompt) + estimate_tokens(_user_prompt(user_query, []))
+    record_budget = token_budget - overhead
+    hotel_samples = [fit_record(hotel, record_budget) for hotel in hotel_samples]
+    keys = [
+        cache_key(user_query, MODEL, SYSTEM_PROMPT_VERSION, hotel)
+        for hotel in hotel_samples
+    ]
+    cached = cache.get_many(keys) if cache else {}
+    if on_results and cached:
+        on_results([cached[key] for key in keys if key in cached])
+    pending = [
+        (key, hotel) for key, hotel in zip(keys, hotel_samples) if key not in cached
+    ]
+    token_counts = [record_tokens(hotel) for _, hotel in pending]
+    plan = plan_batches(token_counts, record_budget, max_batch_hotels)
+    batches = [[pending[i] for i in batch] for batch in plan]
+    if plan:
+        batch_tokens = [overhead + sum(token_counts[i] for i in batch) for batch in plan]
+        print(
+            f"Sending {len(pending)} hotels to DeepSeek in {len(plan)} requests "
+            f"(~{sum(batch_tokens)} prompt tokens): "
+            + ", ".join(
+                f"{len(batch)} hotels/~{tokens} tokens"
+                for batch, tokens in zip(plan, batch_tokens)
+            )
+        )
+
+    scored = {}
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as pool:
+        futures = {
+            pool.submit(
+                _score_batch,
+                [hotel for _, hotel in batch],
+                user_query,
+                max_retries,
+                retry_backoff,
+            ): n
+            for n, batch in enumerate(batches)
+        }
+        for future in as_completed(futures):
+            n = futures[future]
+            try:
+                batch_results = future.result()
+            except Exception as e:
+                print(f"DeepSeek API error on batch {n + 1} of {len(batches)}: {e}")
+                continue
+            by_hotel_id = {h.get("hotel_id"): h for h in batch_results}
+            new_results = {
+                key: by_hotel_id[hotel["hotel_id"]]
+                for key, hotel in batches[n]
+                if hotel["hotel_id"] in by_hotel_id
+            }
+            scored.update(new_results)
+            if cache:
+                cache.put_many(new_results)
+            if on_results and new_results:
+                on_results(list(new_results.values()))
 
-            res = res + json.loads(response.choices[0].message.content)
-        return res
-    except Exception as e:
-        print(f"DeepSeek API error: {e}")
-        return []
+    return [
+        cached.get(key) or scored[key]
+        for key in keys
+        if key in cached or key in scored
+    ]
@@ -0,0 +1,3 @@
+"""
+Local stand-ins for the external APIs used by the Hotel Recommender
+"""
@@ -0,0 +1,177 @@
+"""
+Fake Amadeus Server
+
+A local stand-in for the Amadeus endpoints used by the recommender: OAuth
+tokens, city search, hotel list by city and hotel offers. Cities and hotels
+come from a JSON fixture file when given, and are generated otherwise.
+
+Fixture format:
+    {"cities": {"boston": [{"iataCode": "BOS", "address": {"stateCode": "MA"}}]},
+     "hotels": {"BOS": [{"hotelId": "HIBOS001", "name": "...", "address": {...}}]}}
+
+Usage:
+    python -m fakes.amadeus_server --port 8009 --fixtures amadeus.json --latency 0.2
+    AMADEUS_HOST=127.0.0.1 AMADEUS_PORT=8009 AMADEUS_SSL=false python main.py
+"""
+import argparse
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def _stable_int(*parts):
+    """
+    Returns a stable pseudo random integer for the given values
+    """
+    digest = hashlib.sha256("|".join(map(str, parts)).encode()).digest()
+    return int.from_bytes(digest[:4], "big")
+
+
+def fake_cities(keyword, fixtures):
+    """
+    Returns the city search results for a keyword
+    """
+    cities = fixtures.get("cities", {})
+    if keyword.lower() in cities:
+        return cities[keyword.lower()]
+    return [{"type": "location", "subType": "city", "name": keyword.upper(),
+             "iataCode": keyword[:3].upper(), "address": {"countryCode": "US"}}]
+
+
+def fake_hotels(city_code, fixtures):
+    """
+    Returns the hotel list for a city code
+    """
+    hotels = fixtures.get("hotels", {})
+    if city_code in hotels:
+        return hotels[city_code]
+    return [
+        {
+            "chainCode": "XX",
+            "iataCode": city_code,
+            "name": f"{city_code} FAKE HOTEL {i}",
+            "hotelId": f"XX{city_code}{i:03d}",
+            "address": {"lines": [f"{i} MAIN ST"], "postalCode": f"{i:05d}",
+                        "countryCode": "US"},
+        }
+        for i in range(1, 21)
+    ]
+
+
+def fake_offers(hotel_ids, check_in, check_out, adults):
+    """
+    Returns offers with stable prices for every requested hotel
+    """
+    data = []
+    for hotel_id in hotel_ids:
+        offers = [
+            {
+                "id": f"{hotel_id}-{n}",
+                "checkInDate": check_in,
+                "checkOutDate": check_out,
+                "guests": {"adults": int(adults)},
+                "price": {
+                    "currency": "USD",
+                    "total": f"{80 + _stable_int(hotel_id, check_in, n) % 400}.00",
+                },
+            }
+            for n in range(1 + _stable_int(hotel_id) % 3)
+        ]
+        data.append({"type": "hotel-offers", "hotel": {"hotelId": hotel_id},
+                     "available": True, "offers": offers})
+    return data
+
+
+class FakeAmadeusHandler(BaseHTTPRequestHandler):
+    """
+    Serves the fake Amadeus API, sleeping `latency` seconds per call
+    """
+
+    latency = 0.0
+    fixtures = {}
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path == "/v1/security/oauth2/token":
+            self._send(200, {"type": "amadeusOAuth2Token", "access_token": "fake",
+                             "token_type": "Bearer", "expires_in": 1799})
+        else:
+            self._send(404, {"errors": [{"status": 404, "title": "NOT FOUND"}]})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {k: v for k, v in parse_qs(url.query).items()}
+        first = {k: v[0] for k, v in params.items()}
+        time.sleep(self.latency)
+        with self.server.lock:
+            self.server.request_counts[url.path] = (
+                self.server.request_counts.get(url.path, 0) + 1
+            )
+        if url.path == "/v1/reference-data/locations/cities":
+            data = fake_cities(first.get("keyword", ""), self.fixtures)
+        elif url.path == "/v1/reference-data/locations/hotels/by-city":
+            data = fake_hotels(first.get("cityCode", ""), self.fixtures)
+        elif url.path == "/v3/shopping/hotel-offers":
+            # Accept both repeated and comma separated hotelIds
+            hotel_ids = [i for v in params.get("hotelIds", []) for i in v.split(",")]
+            data = fake_offers(hotel_ids, first.get("checkInDate"),
+                               first.get("checkOutDate"), first.get("adults", 1))
+        else:
+            self._send(404, {"errors": [{"status": 404, "title": "NOT FOUND"}]})
+            return
+        self._send(200, {"data": data})
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/vnd.amadeus+json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(host="127.0.0.1", port=0, latency=0.0, fixtures=None):
+    """
+    Starts the fake server on a background thread and returns it.
+    server.request_counts counts calls per path; call server.shutdown() to stop it.
+    """
+    handler = type(
+        "Handler",
+        (FakeAmadeusHandler,),
+        {"latency": latency, "fixtures": fixtures or {}},
+    )
+    server = ThreadingHTTPServer((host, port), handler)
+    server.lock = threading.Lock()
+    server.request_counts = {}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Amadeus API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8009)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--fixtures", help="JSON file with cities and hotels")
+    args = parser.parse_args()
+
+    fixtures = {}
+    if args.fixtures:
+        with open(args.fixtures) as f:
+            fixtures = json.load(f)
+    server = start_server(args.host, args.port, args.latency, fixtures)
+    print(f"Fake Amadeus server listening on http://{args.host}:{server.server_port}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Fake DeepSeek Server
+
+A local OpenAI-compatible chat completions endpoint for running the recommender
+without a DeepSeek account. Every hotel in a request gets a deterministic score
+derived from its id and the user query.
+
+Usage:
+    python -m fakes.deepseek_server --port 8008 --latency 0.5 --failure-rate 0.1
+    DEEPSEEK_BASE_URL=http://127.0.0.1:8008 DEEPSEEK_API_KEY=fake python main.py
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def fake_score(hotel_id, user_query):
+    """
+    Returns a stable score from 0 to 100 for a hotel and query
+    """
+    digest = hashlib.sha256(f"{hotel_id}|{user_query}".encode()).digest()
+    return round(int.from_bytes(digest[:4], "big") / 0xFFFFFFFF * 100, 2)
+
+
+def fake_completion(messages, model):
+    """
+    Builds a chat completion scoring every hotel found in the user prompt
+    """
+    prompt = messages[-1]["content"]
+    query, _, hotels_json = prompt.partition("\nHotel Reviews:\n")
+    query = query.removeprefix("User Query: ")
+    hotels = json.loads(hotels_json) if hotels_json else []
+    results = [
+        {
+            "hotel_id": hotel["hotel_id"],
+            "score": fake_score(hotel["hotel_id"], query),
+            "key_points": [f"{len(hotel.get('reviews', []))} reviews analyzed"],
+        }
+        for hotel in hotels
+    ]
+    content = json.dumps(results)
+    prompt_tokens = sum(len(m["content"]) for m in messages) // 4
+    completion_tokens = len(content) // 4
+    return {
+        "id": f"chatcmpl-fake-{random.getrandbits(32):08x}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+class FakeDeepSeekHandler(BaseHTTPRequestHandler):
+    """
+    Handles POST /chat/completions, sleeping `latency` seconds and failing
+    a `failure_rate` fraction of requests with a 503
+    """
+
+    latency = 0.0
+    failure_rate = 0.0
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        time.sleep(self.latency)
+        if random.random() < self.failure_rate:
+            self._send(503, {"error": {"message": "Simulated failure"}})
+            return
+        self.server.request_count += 1
+        self._send(200, fake_completion(body["messages"], body.get("model", "fake")))
+
+    def _send(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(host="127.0.0.1", port=0, latency=0.0, failure_rate=0.0):
+    """
+    Starts the fake server on a background thread and returns it.
+    The base URL to use is http://{host}:{server.server_port}; call server.shutdown() to stop it.
+    """
+    handler = type(
+        "Handler",
+        (FakeDeepSeekHandler,),
+        {"latency": latency, "failure_rate": failure_rate},
+    )
+    server = ThreadingHTTPServer((host, port), handler)
+    server.request_count = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake DeepSeek chat completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8008)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = start_server(args.host, args.port, args.latency, args.failure_rate)
+    print(f"Fake DeepSeek server listening on http://{args.host}:{server.server_port}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+LLM Cache Module
+
+A persistent content-addressed cache of per-hotel LLM scoring results, keyed
+by the normalized query, model, prompt version and the hotel's review sample
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+CACHE_PATH = os.path.join("data", "llm_cache.sqlite")
+MAX_AGE = 7 * 24 * 60 * 60
+MAX_BYTES = 64 * 1024 * 1024
+
+
+def normalize_query(user_query):
+    """
+    Lowercases a query and collapses whitespace so trivially different queries share entries
+    """
+    return re.sub(r"\s+", " ", str(user_query)).strip().lower()
+
+
+def cache_key(user_query, model, prompt_version, hotel):
+    """
+    Hashes everything that determines the LLM's answer for one hotel
+    """
+    payload = json.dumps(
+        [normalize_query(user_query), model, prompt_version, hotel],
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResponseCache:
+    """
+    SQLite-backed cache with age and total size based eviction, counting hits and misses.
+    Safe to share between threads, and between the processes of a batch run.
+    """
+
+    def __init__(self, path=CACHE_PATH, max_age=MAX_AGE, max_bytes=MAX_BYTES):
+        self.path = path
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._conn = None
+        self.lock = threading.RLock()
+
+    def _connection(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+        return self._conn
+
+    def get_many(self, keys):
+        """
+        Returns a dict of the cached values found for keys, skipping expired entries
+        """
+        with self.lock:
+            conn = self._connection()
+            now = time.time()
+            found = {}
+            for key in keys:
+                row = conn.execute(
+                    "SELECT value FROM responses WHERE key = ? AND created_at >= ?",
+                    (key, now - self.max_age),
+                ).fetchone()
+                if row:
+                    found[key] = json.loads(row[0])
+            if found:
+                conn.executemany(
+                    "UPDATE responses SET accessed_at = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+                conn.commit()
+            self.hits += len(found)
+            self.misses += len(set(keys) - set(found))
+            return found
+
+    def put_many(self, items):
+        """
+        Stores a dict of key to JSON-serializable value
+        """
+        with self.lock:
+            if not items:
+                return
+            conn = self._connection()
+            now = time.time()
+            rows = []
+            for key, value in items.items():
+                data = json.dumps(value)
+                rows.append((key, data, len(data), now, now))
+            conn.executemany(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)", rows
+            )
+            conn.commit()
+            self.evict()
+
+    def evict(self):
+        """
+        Drops expired entries, then least recently used entries until under max_bytes
+        """
+        with self.lock:
+            conn = self._connection()
+            conn.execute(
+                "DELETE FROM responses WHERE created_at < ?", (time.time() - self.max_age,)
+            )
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total > self.max_bytes:
+                excess = total - self.max_bytes
+                freed = 0
+                stale = []
+                for key, size in conn.execute(
+                    "SELECT key, size FROM responses ORDER BY accessed_at"
+                ):
+                    if freed >= excess:
+                        break
+                    stale.append((key,))
+                    freed += size
+                conn.executemany("DELETE FROM responses WHERE key = ?", stale)
+            conn.commit()
+
+    def summary(self):
+        """
+        Describes the hit and miss counts so far
+        """
+        lookups = self.hits + self.misses
+        rate = self.hits / lookups * 100 if lookups else 0
+        return f"LLM cache: {self.hits} hits, {self.misses} misses ({rate:.0f}% hit rate)"
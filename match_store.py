@@ -0,0 +1,141 @@
+"""
+Match Store Module
+
+Persists offering to Amadeus hotel matches per locality so that repeat runs
+only match new offerings, new Amadeus hotels and entries past their TTL
+"""
+import os
+import re
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+
+from matching import match_offerings
+
+MATCHES_DIR = os.path.join("data", "matches")
+MATCH_TTL = timedelta(days=30)
+
+MATCH_COLUMNS = [
+    "locality",
+    "offering_id",
+    "hotel_id",
+    "score",
+    "hotels_fetched_at",
+    "matched_at",
+]
+
+
+def _slug(locality):
+    """
+    Turns a locality name into a file name
+    """
+    return re.sub(r"[^a-z0-9]+", "_", str(locality).lower()).strip("_")
+
+
+def _paths(locality, store_dir):
+    """
+    Returns the match table and Amadeus hotel snapshot paths for a locality
+    """
+    base = os.path.join(store_dir, _slug(locality))
+    return f"{base}.matches.parquet", f"{base}.hotels.parquet"
+
+
+def load_matches(locality, store_dir=MATCHES_DIR):
+    """
+    Loads the stored matches and the Amadeus hotel ids they were matched against
+    """
+    matches_path, hotels_path = _paths(locality, store_dir)
+    if not (os.path.exists(matches_path) and os.path.exists(hotels_path)):
+        return pd.DataFrame(columns=MATCH_COLUMNS), set()
+    matches = pd.read_parquet(matches_path)
+    known_hotels = set(pd.read_parquet(hotels_path)["hotel_id"])
+    return matches, known_hotels
+
+
+def save_matches(locality, matches, hotel_ids, store_dir=MATCHES_DIR):
+    """
+    Writes the matches for a locality along with the hotel ids they cover
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    matches_path, hotels_path = _paths(locality, store_dir)
+    matches[MATCH_COLUMNS].to_parquet(matches_path, index=False)
+    pd.DataFrame({"hotel_id": sorted(hotel_ids)}).to_parquet(hotels_path, index=False)
+
+
+def update_matches(
+    locality,
+    offerings,
+    hotels,
+    hotels_fetched_at,
+    ttl=MATCH_TTL,
+    store_dir=MATCHES_DIR,
+):
+    """
+    Returns matched_hotel_id and matched_hotel_score for offerings, reusing stored matches.
+    Offerings that are new, past the TTL or matched to a hotel Amadeus no longer lists
+    are matched against every hotel; the rest are only matched against new hotels.
+    hotels is an Amadeus hotel list flattened by pipeline.hotels_frame.
+    """
+    now = datetime.now(timezone.utc)
+    hotel_ids = set(hotels["hotelId"])
+    stored, known_hotels = load_matches(locality, store_dir)
+
+    stored = stored.set_index("offering_id")
+    stored = stored[stored.index.isin(offerings["id"])]
+    fresh = stored[
+        (pd.to_datetime(stored["matched_at"], utc=True) >= now - ttl)
+        & (stored["hotel_id"].isna() | stored["hotel_id"].isin(hotel_ids))
+    ]
+
+    result = pd.DataFrame(
+        {
+            "matched_hotel_id": fresh["hotel_id"].reindex(offerings["id"]).to_numpy(),
+            "matched_hotel_score": fresh["score"].reindex(offerings["id"]).to_numpy(),
+            "matched_at": fresh["matched_at"].reindex(offerings["id"]).to_numpy(),
+        },
+        index=offerings.index,
+    ).astype({"matched_hotel_id": object})
+    is_fresh = offerings["id"].isin(fresh.index).to_numpy()
+
+    stale_offerings = offerings[~is_fresh]
+    if not stale_offerings.empty:
+        matched = match_offerings(stale_offerings, hotels)
+        result.loc[matched.index, "matched_hotel_id"] = matched["matched_hotel_id"]
+        result.loc[matched.index, "matched_hotel_score"] = matched["matched_hotel_score"]
+        result.loc[matched.index, "matched_at"] = now
+
+    new_hotels = hotels[~hotels["hotelId"].isin(known_hotels)]
+    fresh_offerings = offerings[is_fresh]
+    if not new_hotels.empty and not fresh_offerings.empty:
+        matched = match_offerings(fresh_offerings, new_hotels)
+        improved = matched[
+            matched["matched_hotel_score"]
+            > result.loc[matched.index, "matched_hotel_score"]
+        ]
+        result.loc[improved.index, "matched_hotel_id"] = improved["matched_hotel_id"]
+        result.loc[improved.index, "matched_hotel_score"] = improved["matched_hotel_score"]
+
+    message = (
+        f"Reused {is_fresh.sum()} stored matches, "
+        f"matched {len(stale_offerings)} offerings against all hotels"
+    )
+    if not new_hotels.empty and not fresh_offerings.empty:
+        message += f" and {len(fresh_offerings)} against {len(new_hotels)} new hotels"
+    print(message + ".")
+
+    save_matches(
+        locality,
+        pd.DataFrame(
+            {
+                "locality": str(locality),
+                "offering_id": offerings["id"].to_numpy(),
+                "hotel_id": result["matched_hotel_id"].to_numpy(),
+                "score": result["matched_hotel_score"].astype(float).to_numpy(),
+                "hotels_fetched_at": pd.Timestamp(hotels_fetched_at),
+                "matched_at": pd.to_datetime(result["matched_at"], utc=True).array,
+            }
+        ),
+        hotel_ids,
+        store_dir,
+    )
+    return result[["matched_hotel_id", "matched_hotel_score"]]
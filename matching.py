@@ -0,0 +1,249 @@
+"""
+Matching Module
+
+Fuzzy matches TripAdvisor offerings to Amadeus hotels. A cheap upper bound of
+every name score, from the tokens and characters two names share, rules out the
+pairs that cannot reach the match threshold, and only the rest are scored.
+"""
+import re
+from collections import Counter, defaultdict
+
+import numpy as np
+import pandas as pd
+from rapidfuzz import fuzz, process
+
+NAME_WEIGHT = 0.5
+ADDRESS_WEIGHT = 0.4
+POSTAL_WEIGHT = 0.1
+MATCH_THRESHOLD = 80
+
+# Offering x hotel pairs whose name bounds are computed at once, which bounds memory
+CHUNK_PAIRS = 256 * 1024
+
+# Characters normalize keeps besides spaces
+ALPHABET = "abcdefghijklmnopqrstuvwxyz0123456789"
+ALPHABET_INDEX = {char: i for i, char in enumerate(ALPHABET)}
+
+
+def normalize(text):
+    """
+    Normalizes fields in data to try to fuzzy match
+    """
+    if pd.isnull(text):
+        return ""
+    text = str(text).lower().strip()
+    text = re.sub(r"[^a-z0-9 ]", "", text)
+    return text
+
+
+def normalize_column(values):
+    """
+    Normalizes a column into an object array. Categorical columns only normalize each
+    distinct value once.
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # Missing values have code -1, which picks the trailing ""
+        categories = np.array(
+            [normalize(x) for x in values.cat.categories] + [""], dtype=object
+        )
+        return categories[values.cat.codes.to_numpy()]
+    return np.array([normalize(x) for x in values], dtype=object)
+
+
+def normalize_offerings(offerings):
+    """
+    Returns normalized name, street address and postal code arrays for offerings
+    """
+    return (
+        normalize_column(offerings["name"]),
+        normalize_column(offerings["street_address"]),
+        normalize_column(offerings["postal_code"]),
+    )
+
+
+def normalize_hotels(hotels):
+    """
+    Returns normalized name, address line and postal code arrays for Amadeus hotels
+    flattened by pipeline.hotels_frame
+    """
+    return (
+        normalize_column(hotels["name"]),
+        normalize_column(hotels["address_line"]),
+        normalize_column(hotels["postal_code"]),
+    )
+
+
+def _name_profiles(names):
+    """
+    Returns the sorted distinct tokens of each name with their count, total length and
+    character histogram, the parts of a name token_set_ratio looks at
+    """
+    tokens = [sorted(set(name.split())) for name in names]
+    counts = np.array([len(t) for t in tokens], dtype=np.int32)
+    lengths = np.array([sum(map(len, t)) for t in tokens], dtype=np.int32)
+    histograms = np.zeros((len(names), len(ALPHABET)), dtype=np.int32)
+    for row, name_tokens in enumerate(tokens):
+        for char, count in Counter("".join(name_tokens)).items():
+            histograms[row, ALPHABET_INDEX[char]] = count
+    return tokens, counts, lengths, histograms
+
+
+def _unary(histograms, max_count):
+    """
+    Encodes character counts in unary, so the product of two encodings counts the
+    characters two names have in common
+    """
+    return (histograms[:, :, None] > np.arange(max_count)).reshape(
+        len(histograms), len(ALPHABET) * max_count
+    ).astype(np.float32)
+
+
+def _build_index(keys):
+    """
+    Builds an inverted index from each key to the sorted positions containing it
+    """
+    index = defaultdict(list)
+    for pos, pos_keys in enumerate(keys):
+        for key in pos_keys:
+            index[key].append(pos)
+    return {key: np.array(positions) for key, positions in index.items()}
+
+
+def _name_bounds(shared_tokens, shared_chars, common_chars, off_counts, off_lengths,
+                 hotel_counts, hotel_lengths):
+    """
+    Returns upper bounds of token_set_ratio for (offering x hotel) name pairs.
+    token_set_ratio takes the best of two ratios that only depend on the lengths of the
+    shared and the differing tokens, and the ratio of the differing tokens. The Indel
+    distance of those is at least the difference of their character counts, which equals
+    the difference of the whole names' counts, as the shared tokens cancel out.
+    """
+    k, na, nb = shared_tokens, off_counts[:, None], hotel_counts[None, :]
+    sect = np.where(k > 0, shared_chars + k - 1, 0)
+    ab = np.where(na > k, off_lengths[:, None] - shared_chars + na - k - 1, 0)
+    ba = np.where(nb > k, hotel_lengths[None, :] - shared_chars + nb - k - 1, 0)
+    sect_ab = sect + (k > 0) + ab
+    sect_ba = sect + (k > 0) + ba
+    # Differing characters, plus the spaces, which differ by the token counts
+    min_distance = (
+        off_lengths[:, None] + hotel_lengths[None, :] - 2 * common_chars + np.abs(na - nb)
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        bounds = np.maximum.reduce([
+            100 * (1 - min_distance / (sect_ab + sect_ba)),
+            np.where(k > 0, 100 * (1 - ((k > 0) + ab) / (sect + sect_ab)), 0),
+            np.where(k > 0, 100 * (1 - ((k > 0) + ba) / (sect + sect_ba)), 0),
+        ])
+    # One name's tokens all appear in the other
+    bounds[(k > 0) & ((k == na) | (k == nb))] = 100
+    bounds[(na == 0) | (nb == 0)] = 0
+    return bounds
+
+
+def match_offerings(offerings, hotels, threshold=MATCH_THRESHOLD, chunk_pairs=CHUNK_PAIRS):
+    """
+    Matches each offering to its best scoring Amadeus hotel.
+    Scores are 0.5 * name + 0.4 * address token set ratio + 0.1 * postal code match;
+    offerings whose best score is below the threshold get no hotel id.
+    Returns a DataFrame with matched_hotel_id and matched_hotel_score aligned to offerings.
+    Matched hotels and their scores are the same as scoring every pair and keeping the
+    first best hotel. An unmatched offering's score is the best among the hotels that
+    could have matched it, so it can be lower than the best over every hotel.
+    """
+    off_names, off_addresses, off_postals = normalize_offerings(offerings)
+    hotel_names, hotel_addresses, hotel_postals = normalize_hotels(hotels)
+    hotel_ids = (
+        hotels["hotelId"].to_numpy(dtype=object)
+        if "hotelId" in hotels.columns
+        else np.full(len(hotels), None, dtype=object)
+    )
+    best_scores = np.zeros(len(offerings))
+    best_hotels = np.full(len(offerings), -1, dtype=np.intp)
+    if not len(hotels):
+        return pd.DataFrame(
+            {
+                "matched_hotel_id": np.full(len(offerings), None, dtype=object),
+                "matched_hotel_score": best_scores,
+            },
+            index=offerings.index,
+        )
+
+    # Postal codes as integer codes shared by both sides; an empty one never matches
+    postals = np.concatenate([off_postals, hotel_postals])
+    postal_codes = pd.factorize(postals)[0]
+    postal_codes[postals == ""] = -1
+    off_postal_codes = postal_codes[: len(offerings)]
+    hotel_postal_codes = postal_codes[len(offerings) :]
+
+    off_tokens, off_counts, off_lengths, off_histograms = _name_profiles(off_names)
+    hotel_tokens, hotel_counts, hotel_lengths, hotel_histograms = _name_profiles(hotel_names)
+    max_count = int(max(off_histograms.max(initial=0), hotel_histograms.max(initial=0)))
+    off_unary = _unary(off_histograms, max_count)
+    hotel_unary = _unary(hotel_histograms, max_count).T
+    name_index = _build_index(hotel_tokens)
+
+    chunk_size = max(1, chunk_pairs // len(hotels))
+    for start in range(0, len(offerings), chunk_size):
+        rows = np.arange(start, min(start + chunk_size, len(offerings)))
+        shared_tokens = np.zeros((len(rows), len(hotels)), dtype=np.int32)
+        shared_chars = np.zeros_like(shared_tokens)
+        for i, r in enumerate(rows):
+            for token in off_tokens[r]:
+                positions = name_index.get(token)
+                if positions is not None:
+                    shared_tokens[i, positions] += 1
+                    shared_chars[i, positions] += len(token)
+        name_bounds = _name_bounds(
+            shared_tokens,
+            shared_chars,
+            np.rint(off_unary[rows] @ hotel_unary).astype(np.int32),
+            off_counts[rows],
+            off_lengths[rows],
+            hotel_counts,
+            hotel_lengths,
+        )
+        postal_scores = np.where(
+            (off_postal_codes[rows, None] == hotel_postal_codes[None, :])
+            & (off_postal_codes[rows, None] >= 0),
+            100, 0,
+        )
+
+        # Only pairs that could reach the threshold are scored, with a margin for rounding
+        bounds = NAME_WEIGHT * name_bounds + ADDRESS_WEIGHT * 100 + POSTAL_WEIGHT * postal_scores
+        i, j = np.nonzero(bounds >= threshold - 1e-6)
+        if not i.size:
+            continue
+        r = rows[i]
+        name_scores = process.cpdist(
+            off_names[r], hotel_names[j], scorer=fuzz.token_set_ratio,
+            dtype=np.float64, workers=-1,
+        )
+        postals = postal_scores[i, j]
+        bounds = NAME_WEIGHT * name_scores + ADDRESS_WEIGHT * 100 + POSTAL_WEIGHT * postals
+        keep = bounds >= threshold
+        r, j, name_scores, postals = r[keep], j[keep], name_scores[keep], postals[keep]
+        if not r.size:
+            continue
+        address_scores = process.cpdist(
+            off_addresses[r], hotel_addresses[j], scorer=fuzz.token_set_ratio,
+            dtype=np.float64, workers=-1,
+        )
+        total = (
+            NAME_WEIGHT * name_scores
+            + ADDRESS_WEIGHT * address_scores
+            + POSTAL_WEIGHT * postals
+        )
+
+        # Best pair per offering, the first hotel on ties like a strict > scan in hotel order
+        order = np.lexsort((j, -total, r))
+        first = order[np.r_[True, r[order][1:] != r[order][:-1]]]
+        best_scores[r[first]] = total[first]
+        best_hotels[r[first]] = j[first]
+
+    matched_ids = np.where(
+        best_scores >= threshold, hotel_ids[np.maximum(best_hotels, 0)], None
+    )
+    return pd.DataFrame(
+        {"matched_hotel_id": matched_ids, "matched_hotel_score": best_scores},
+        index=offerings.index,
+    )
@@ -0,0 +1,423 @@
+"""
+Pipeline Module
+
+The recommendation pipeline stages shared by the interactive script and the
+recommendation service: load, parse, select locality, IATA lookup, hotel fetch,
+match, pre-ranking, review sampling, LLM scoring and pricing
+"""
+import heapq
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from amadeus import ResponseError
+
+from data_acquisition import acquire_dataset
+from data_cache import ensure_cache, load_offerings
+from deepseek_enrichment import find_best_hotels
+from match_store import update_matches
+from pricing import PRICE_CONCURRENCY, fetch_prices
+from review_index import sample_key
+
+# Seed for the per-hotel review samples sent to the LLM
+REVIEW_SAMPLE_SEED = os.getenv("REVIEW_SAMPLE_SEED", "0")
+REVIEWS_PER_HOTEL = 10
+TOP_N = 10
+# Hotels kept by the local pre-ranking for LLM scoring; 0 sends every matched hotel
+SHORTLIST_SIZE = int(os.getenv("PRERANK_SHORTLIST", "30"))
+# Hotels rated below this recency weighted overall rating are not considered; 0 keeps all
+MIN_RATING = float(os.getenv("PRERANK_MIN_RATING", "0"))
+# Offering columns the stages use; the rest of the cached columns are never loaded
+OFFERINGS_COLUMNS = ["id", "name", "locality", "region", "street_address", "postal_code"]
+
+
+def load_raw_offerings() -> pd.DataFrame:
+    """
+    Loads offerings from the columnar cache, downloading the dataset if it is missing or
+    stale and rebuilding the cache (which parses the addresses) if the raw data changed
+    """
+    acquire_dataset()
+    ensure_cache()
+    return load_offerings(columns=OFFERINGS_COLUMNS)
+
+
+def parse_offerings(offerings_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Keeps the offerings whose address parsed into a street address and postal code
+    """
+    return offerings_df.dropna(subset=["street_address", "postal_code"])
+
+
+def load_offerings_table() -> pd.DataFrame:
+    """
+    Runs the load and parse stages
+    """
+    return parse_offerings(load_raw_offerings())
+
+
+def locality_offerings(
+    offerings_df: pd.DataFrame, locality: str
+) -> tuple[pd.DataFrame, Optional[str]]:
+    """
+    Returns the offerings in a locality and the locality's region
+    """
+    offerings_subset = offerings_df[offerings_df["locality"] == locality]
+    region = offerings_subset["region"].iloc[0] if not offerings_subset.empty else None
+    return offerings_subset, region
+
+
+def lookup_iata(gateway, locality: str, region: Optional[str]) -> Optional[str]:
+    """
+    Looks up the locality's IATA code, returning None if no valid code was found
+    """
+    iata_code = gateway.get_iata_code(locality, region)
+    if not iata_code or len(iata_code) != 3:
+        print(
+            f"Could not determine a valid IATA code for {locality} ({region}). Skipping Amadeus hotel search."
+        )
+        return None
+    return iata_code
+
+
+def _nested(hotel: dict, key: str, field: str):
+    """
+    Returns hotel[key][field], or None if either is missing
+    """
+    value = hotel.get(key)
+    return value.get(field) if isinstance(value, dict) else None
+
+
+def hotels_frame(hotels: list[dict]) -> pd.DataFrame:
+    """
+    Flattens an Amadeus hotel list into typed columns: Arrow-backed strings for ids,
+    names and the first address line, categoricals for the fields shared by many
+    hotels and float32 coordinates. Repeated hotel ids are dropped.
+    """
+    string = pd.StringDtype("pyarrow")
+    names = [h.get("name") for h in hotels]
+    address_lines = [_nested(h, "address", "lines") for h in hotels]
+
+    def address(field):
+        return pd.Categorical([_nested(h, "address", field) for h in hotels])
+
+    def coordinate(field):
+        return pd.array([_nested(h, "geoCode", field) for h in hotels], dtype="Float32")
+
+    hotels_df = pd.DataFrame(
+        {
+            "hotelId": pd.array([str(h.get("hotelId")) for h in hotels], dtype=string),
+            "name": pd.array(
+                [n.get("text") if isinstance(n, dict) else n for n in names], dtype=string
+            ),
+            "chain_code": pd.Categorical([h.get("chainCode") for h in hotels]),
+            "address_line": pd.array(
+                [lines[0] if lines else None for lines in address_lines], dtype=string
+            ),
+            "postal_code": address("postalCode"),
+            "city_name": address("cityName"),
+            "country_code": address("countryCode"),
+            "latitude": coordinate("latitude"),
+            "longitude": coordinate("longitude"),
+        }
+    )
+    return hotels_df.drop_duplicates("hotelId", ignore_index=True)
+
+
+def fetch_hotels(
+    gateway, iata_code: Optional[str]
+) -> tuple[pd.DataFrame, Optional[datetime]]:
+    """
+    Loads the Amadeus hotel list of a city.
+    Returns (hotels_df, fetched_at); hotels_df is empty if nothing was found.
+    """
+    if not iata_code:
+        return pd.DataFrame(), None
+    print(f"\nHotels from Amadeus API (IATA: {iata_code}):")
+    try:
+        # The hotel list for a city is cached, so repeat lookups do not hit the API
+        hotels, fetched_at = gateway.get_hotels(iata_code)
+    except ResponseError as error:
+        print(f"Amadeus API error: {error}")
+        return pd.DataFrame(), None
+    except Exception as e:
+        print(f"Unexpected error during Amadeus hotel search: {e}")
+        return pd.DataFrame(), None
+    if not hotels:
+        print(f"No hotels found in Amadeus for IATA code {iata_code}.")
+        return pd.DataFrame(), fetched_at
+    hotels_df = hotels_frame(hotels)
+    print(f"\nTotal hotels loaded from Amadeus for {iata_code}: {len(hotels_df)}")
+    return hotels_df, fetched_at
+
+
+def match_hotels(
+    locality: str,
+    offerings_subset: pd.DataFrame,
+    hotels_df: pd.DataFrame,
+    fetched_at: Optional[datetime],
+) -> pd.DataFrame:
+    """
+    Matches the locality's offerings to Amadeus hotels, reusing stored matches, and
+    returns one row per matched pair with the offering id and name, the Amadeus hotel
+    id and name and the match score
+    """
+    if hotels_df.empty:
+        print("No hotels found for matching.")
+        return pd.DataFrame()
+    matches = update_matches(locality, offerings_subset, hotels_df, fetched_at)
+    matched_ids = matches["matched_hotel_id"]
+    print(
+        f"Matched {matched_ids.notnull().sum()} out of {len(offerings_subset)} offerings to Amadeus hotels."
+    )
+    # Positions of each offering's hotel in hotels_df, -1 if unmatched
+    hotel_pos = pd.Index(hotels_df["hotelId"]).get_indexer(matched_ids.astype("string"))
+    matched = np.flatnonzero(hotel_pos >= 0)
+    hotel_pos = hotel_pos[matched]
+    matched_hotels_df = pd.DataFrame(
+        {
+            "id": offerings_subset["id"].to_numpy()[matched],
+            "name_offering": offerings_subset["name"].array[matched],
+            "hotelId": hotels_df["hotelId"].array[hotel_pos],
+            "name_hotel": hotels_df["name"].array[hotel_pos],
+            "matched_hotel_score": matches["matched_hotel_score"].to_numpy()[matched],
+        }
+    )
+    print(f"\nTotal matched hotel-offering pairs: {len(matched_hotels_df)}")
+    return matched_hotels_df
+
+
+def shortlist_hotels(
+    ranker,
+    matched_hotels_df: pd.DataFrame,
+    user_query: str,
+    k: int = SHORTLIST_SIZE,
+    ratings=None,
+    min_rating: float = MIN_RATING,
+) -> pd.DataFrame:
+    """
+    Drops hotels rated below min_rating, then ranks the rest against the query with the
+    local BM25 review index and keeps the best k, so only those are sampled and scored
+    by the LLM. Hotels without ratings are never dropped.
+    """
+    if ratings is not None and min_rating:
+        overall = ratings.aspect(matched_hotels_df["id"].to_numpy())
+        keep = np.isnan(overall) | (overall >= min_rating)
+        if not keep.all():
+            print(f"Skipping {(~keep).sum()} hotels rated below {min_rating}.")
+        matched_hotels_df = matched_hotels_df[keep]
+    if not k or len(matched_hotels_df) <= k:
+        return matched_hotels_df
+    order = ranker.rank(user_query, matched_hotels_df["id"].to_numpy())
+    print(
+        f"Pre-ranked {len(matched_hotels_df)} hotels locally; scoring the top {k} with DeepSeek."
+    )
+    return matched_hotels_df.iloc[order[:k]]
+
+
+def build_review_records(
+    review_index,
+    matched_hotels_df: pd.DataFrame,
+    seed: str = REVIEW_SAMPLE_SEED,
+    ratings=None,
+) -> list[dict]:
+    """
+    Builds the hotel review records sent to the LLM from a seeded sample of each hotel's
+    reviews. With a rating table, each record carries the hotel's aggregate ratings
+    instead of the raw ratings of every sampled review.
+    """
+    offering_ids = matched_hotels_df["id"].to_numpy()
+    summaries = (
+        ratings.summaries(offering_ids) if ratings is not None else [None] * len(offering_ids)
+    )
+    records = []
+    for hotel_id, offering_id, summary in zip(
+        matched_hotels_df["hotelId"], offering_ids, summaries
+    ):
+        reviews = review_index.sample(
+            offering_id, REVIEWS_PER_HOTEL, seed=sample_key(seed, offering_id)
+        )
+        if summary is None:
+            records.append({"hotel_id": hotel_id, "reviews": reviews})
+            continue
+        for review in reviews:
+            review.pop("rating", None)
+        records.append({"hotel_id": hotel_id, "ratings": summary, "reviews": reviews})
+    return records
+
+
+def get_score(h):
+    """
+    Sort by score and get top 10 hotels (descending)
+    """
+    try:
+        return float(h.get("score", 0))
+    except Exception:
+        return 0
+
+
+class RunningTop:
+    """
+    Bounded min-heap of the n best scored hotels seen so far. Equal scores are ordered by
+    the recency weighted overall rating, then by arrival.
+    """
+
+    def __init__(self, n: int = TOP_N, recent_rating: Optional[dict] = None):
+        self.n = n
+        self.recent_rating = recent_rating or {}
+        self._heap = []
+        self._seen = 0
+
+    def push(self, hotels: list[dict]) -> list[dict]:
+        """
+        Adds scored hotels and returns, best first, those of them now in the top n
+        """
+        first = self._seen
+        for hotel in hotels:
+            item = (
+                get_score(hotel),
+                self.recent_rating.get(hotel.get("hotel_id"), 0),
+                -self._seen,
+                hotel,
+            )
+            self._seen += 1
+            if len(self._heap) < self.n:
+                heapq.heappush(self._heap, item)
+            elif self._heap and item[:3] > self._heap[0][:3]:
+                heapq.heapreplace(self._heap, item)
+        return [item[3] for item in sorted(self._heap, reverse=True) if -item[2] >= first]
+
+    def ranked(self) -> list[dict]:
+        """
+        Returns the top hotels, best first
+        """
+        return [item[3] for item in sorted(self._heap, reverse=True)]
+
+
+def _recent_ratings(hotel_review_records: list[dict]) -> dict:
+    """
+    Maps hotel ids to their recency weighted overall rating, 0 if unrated
+    """
+    return {
+        record["hotel_id"]: record.get("ratings", {}).get("recent_overall", 0)
+        for record in hotel_review_records
+    }
+
+
+def price_status(hotel_id: str, prices: dict, unavailable: set) -> str:
+    """
+    Returns "ok" if a hotel has a price, "unavailable" if its price request failed and
+    "no_offers" otherwise
+    """
+    if prices.get(hotel_id):
+        return "ok"
+    return "unavailable" if hotel_id in unavailable else "no_offers"
+
+
+def stream_hotels(
+    gateway,
+    hotel_review_records: list[dict],
+    user_query: str,
+    check_in: str,
+    check_out: str,
+    adults: int = 1,
+    on_event=None,
+) -> tuple[list[dict], list[dict], dict, set]:
+    """
+    Runs the LLM scoring and pricing stages together. The top hotels are kept up to date
+    as each DeepSeek batch returns, and hotels are priced as soon as they enter the top,
+    so the first results only wait for the fastest batch.
+    on_event, if given, is called (never concurrently) with
+    {"event": "ranking", "hotels", "scored", "total"} whenever the top changes and
+    {"event": "price", "hotel_id", "price", "status"} for every hotel priced.
+    Returns (top_hotels, top_hotels_sorted, prices, unavailable): every scored hotel, the
+    top ones sorted by score with ties broken by the recency weighted overall rating, and
+    the prices and failed price requests of the hotels that were ever in the top, as
+    pricing.fetch_prices returns them.
+    """
+    top = RunningTop(recent_rating=_recent_ratings(hotel_review_records))
+    prices, unavailable = {}, set()
+    requested = set()
+    events_lock = threading.Lock()
+    scored = 0
+
+    def emit(event):
+        if on_event is not None:
+            with events_lock:
+                on_event(event)
+
+    def price(hotel_ids):
+        new_prices, new_unavailable = fetch_prices(
+            gateway, hotel_ids, check_in, check_out, adults=adults
+        )
+        with events_lock:
+            prices.update(new_prices)
+            unavailable.update(new_unavailable)
+            if on_event is None:
+                return
+            for hotel_id in hotel_ids:
+                on_event(
+                    {
+                        "event": "price",
+                        "hotel_id": hotel_id,
+                        "price": prices.get(hotel_id),
+                        "status": price_status(hotel_id, prices, unavailable),
+                    }
+                )
+
+    with ThreadPoolExecutor(max_workers=PRICE_CONCURRENCY) as pool:
+        price_futures = []
+
+        def on_results(hotels):
+            nonlocal scored
+            scored += len(hotels)
+            entered = top.push(hotels)
+            if not entered:
+                return
+            # Hotels pushed out of the top again later keep their price
+            new_ids = [
+                h["hotel_id"]
+                for h in entered
+                if h.get("hotel_id") and h["hotel_id"] not in requested
+            ]
+            requested.update(new_ids)
+            if new_ids:
+                price_futures.append(pool.submit(price, new_ids))
+            emit(
+                {
+                    "event": "ranking",
+                    "hotels": top.ranked(),
+                    "scored": scored,
+                    "total": len(hotel_review_records),
+                }
+            )
+
+        top_hotels = find_best_hotels(hotel_review_records, user_query, on_results=on_results)
+        for future in price_futures:
+            future.result()
+    return top_hotels, top.ranked(), prices, unavailable
+
+
+def default_dates(days_ahead: int = 60, nights: int = 1) -> tuple[str, str]:
+    """
+    Returns check-in and check-out date strings for a stay starting days_ahead from today
+    """
+    check_in = datetime.now().date() + timedelta(days=days_ahead)
+    check_out = check_in + timedelta(days=nights)
+    return check_in.strftime("%Y-%m-%d"), check_out.strftime("%Y-%m-%d")
+
+
+def hotel_names(hotels_df: pd.DataFrame) -> dict:
+    """
+    Maps Amadeus hotel ids to hotel names for display
+    """
+    if hotels_df.empty or "hotelId" not in hotels_df.columns:
+        return {}
+    names = hotels_df["name"] if "name" in hotels_df.columns else hotels_df["hotelId"]
+    return {
+        hotel_id: name if pd.notnull(name) else hotel_id
+        for hotel_id, name in zip(hotels_df["hotelId"].astype(str), names)
+    }
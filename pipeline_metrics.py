@@ -0,0 +1,180 @@
+"""
+Pipeline Metrics Module
+
+Runs pipeline stages while recording their wall time, rows in and out, peak
+memory, the memory held by their output tables and external API calls, and
+reports them as a table or JSON
+"""
+import json
+import sys
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Optional
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+import pandas as pd
+
+import deepseek_enrichment
+
+
+@dataclass
+class StageMetrics:
+    """
+    Measurements of one pipeline stage. peak_rss_mb is the process high-water mark
+    at the end of the stage, so a stage that raised it is the one that used the memory.
+    output_mb is the memory held by the DataFrames the stage returned.
+    """
+
+    stage: str
+    seconds: float
+    rows_in: Optional[int]
+    rows_out: Optional[int]
+    peak_rss_mb: Optional[float]
+    output_mb: Optional[float]
+    amadeus_calls: int
+    deepseek_calls: int
+
+
+def peak_rss_mb() -> Optional[float]:
+    """
+    Returns the peak resident set size of this process in MB, or None if unknown
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def row_count(value: Any) -> Optional[int]:
+    """
+    Counts the rows of a stage output: its length, or None for scalars
+    """
+    if value is None or isinstance(value, (str, bytes)):
+        return None
+    try:
+        return len(value)
+    except TypeError:
+        return None
+
+
+def frame_mb(value: Any) -> Optional[float]:
+    """
+    Returns the memory in MB of the DataFrames in a stage output (a DataFrame or a tuple
+    holding some), or None if it has none
+    """
+    values = value if isinstance(value, tuple) else (value,)
+    frames = [v for v in values if isinstance(v, pd.DataFrame)]
+    if not frames:
+        return None
+    return sum(int(f.memory_usage(deep=True).sum()) for f in frames) / (1024 * 1024)
+
+
+class PipelineRunner:
+    """
+    Runs stages and records a StageMetrics for each, including stages that fail
+    """
+
+    def __init__(self, gateway=None):
+        self.gateway = gateway
+        self.metrics: list[StageMetrics] = []
+
+    def _calls(self) -> tuple[int, int]:
+        amadeus_calls = self.gateway.calls if self.gateway is not None else 0
+        return amadeus_calls, deepseek_enrichment.api_calls
+
+    def run(
+        self,
+        stage: str,
+        func: Callable[..., Any],
+        *args,
+        rows_in: Optional[int] = None,
+        rows_out: Callable[[Any], Optional[int]] = row_count,
+        **kwargs,
+    ) -> Any:
+        """
+        Calls func(*args, **kwargs) as the named stage and returns its result.
+        rows_out maps the result to the number of rows it produced.
+        """
+        amadeus_before, deepseek_before = self._calls()
+        start = time.perf_counter()
+        result = None
+        try:
+            result = func(*args, **kwargs)
+            return result
+        finally:
+            seconds = time.perf_counter() - start
+            amadeus_after, deepseek_after = self._calls()
+            self.metrics.append(
+                StageMetrics(
+                    stage=stage,
+                    seconds=seconds,
+                    rows_in=rows_in,
+                    rows_out=rows_out(result) if result is not None else None,
+                    peak_rss_mb=peak_rss_mb(),
+                    output_mb=frame_mb(result),
+                    amadeus_calls=amadeus_after - amadeus_before,
+                    deepseek_calls=deepseek_after - deepseek_before,
+                )
+            )
+
+    def table(self) -> str:
+        """
+        Formats the recorded stages as a plain text table with a total row
+        """
+        header = (
+            "stage",
+            "seconds",
+            "rows in",
+            "rows out",
+            "peak RSS MB",
+            "output MB",
+            "amadeus",
+            "deepseek",
+        )
+        rows = [
+            (
+                m.stage,
+                f"{m.seconds:.3f}",
+                "" if m.rows_in is None else str(m.rows_in),
+                "" if m.rows_out is None else str(m.rows_out),
+                "" if m.peak_rss_mb is None else f"{m.peak_rss_mb:.1f}",
+                "" if m.output_mb is None else f"{m.output_mb:.2f}",
+                str(m.amadeus_calls),
+                str(m.deepseek_calls),
+            )
+            for m in self.metrics
+        ]
+        rows.append(
+            (
+                "total",
+                f"{sum(m.seconds for m in self.metrics):.3f}",
+                "",
+                "",
+                "",
+                "",
+                str(sum(m.amadeus_calls for m in self.metrics)),
+                str(sum(m.deepseek_calls for m in self.metrics)),
+            )
+        )
+        widths = [max(len(row[i]) for row in [header, *rows]) for i in range(len(header))]
+        lines = [
+            "  ".join(
+                cell.ljust(width) if i == 0 else cell.rjust(width)
+                for i, (cell, width) in enumerate(zip(row, widths))
+            )
+            for row in [header, *rows]
+        ]
+        lines.insert(1, "  ".join("-" * width for width in widths))
+        return "\n".join(lines)
+
+    def to_json(self, path: str) -> None:
+        """
+        Writes the recorded stages to path as a JSON list
+        """
+        with open(path, "w") as f:
+            json.dump([asdict(m) for m in self.metrics], f, indent=2)
@@ -0,0 +1,126 @@
+"""
+Pricing Module
+
+Fetches current Amadeus hotel prices in concurrent chunks, keeping whatever
+succeeded, and caches each hotel's lowest offer for a short time
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from amadeus import ResponseError
+
+# Hotel ids per hotel-offers request
+PRICE_CHUNK_SIZE = int(os.getenv("AMADEUS_PRICE_CHUNK_SIZE", "5"))
+# Chunk requests in flight at once; the gateway's rate limiter still applies
+PRICE_CONCURRENCY = 4
+# Prices change quickly, so they are only reused for a few minutes
+PRICE_TTL = 15 * 60
+
+
+def lowest_offer(hotel_offers):
+    """
+    Returns the lowest priced offer of one hotel-offers entry as
+    {"price_val", "price", "currency"}, or None if no offer has a usable price
+
+    >>> lowest_offer({"offers": [
+    ...     {"price": {"total": "120.00", "currency": "USD"}},
+    ...     {"price": {"total": "n/a", "currency": "USD"}},
+    ...     {"price": {"total": "99.50", "currency": "USD"}},
+    ... ]})
+    {'price_val': 99.5, 'price': '99.50', 'currency': 'USD'}
+    >>> lowest_offer({"offers": []}) is None
+    True
+    """
+    lowest = None
+    for o in hotel_offers.get("offers") or []:
+        price = o.get("price", {}).get("total")
+        currency = o.get("price", {}).get("currency")
+        if price is None:
+            continue
+        try:
+            price_val = float(price)
+        except (TypeError, ValueError):
+            continue
+        if lowest is None or price_val < lowest["price_val"]:
+            lowest = {"price_val": price_val, "price": price, "currency": currency}
+    return lowest
+
+
+def lowest_prices(offers):
+    """
+    Maps each hotelId in a hotel-offers response to its lowest offer
+
+    >>> lowest_prices([
+    ...     {"hotel": {"hotelId": "A"}, "offers": [{"price": {"total": "80", "currency": "EUR"}}]},
+    ...     {"hotel": {"hotelId": "B"}, "offers": []},
+    ... ])
+    {'A': {'price_val': 80.0, 'price': '80', 'currency': 'EUR'}, 'B': None}
+    """
+    prices = {}
+    for offer in offers or []:
+        hotel_id = offer.get("hotel", {}).get("hotelId")
+        if hotel_id:
+            prices[hotel_id] = lowest_offer(offer)
+    return prices
+
+
+def _price_key(hotel_id, check_in, check_out, adults):
+    return f"price:{hotel_id}|{check_in}|{check_out}|{adults}"
+
+
+def fetch_prices(
+    gateway,
+    hotel_ids,
+    check_in,
+    check_out,
+    adults=1,
+    chunk_size=PRICE_CHUNK_SIZE,
+    max_concurrency=PRICE_CONCURRENCY,
+):
+    """
+    Returns (prices, unavailable): the lowest offer (or None when Amadeus has no offer)
+    for every hotel whose price could be fetched, and the set of hotel ids whose
+    request failed
+    """
+    prices = {}
+    pending = []
+    for hotel_id in dict.fromkeys(hotel_ids):
+        entry = gateway.cache.get(_price_key(hotel_id, check_in, check_out, adults))
+        if entry is not None:
+            prices[hotel_id] = entry[0]
+        else:
+            pending.append(hotel_id)
+
+    def fetch_chunk(chunk):
+        return lowest_prices(
+            gateway.search_offers(
+                hotelIds=",".join(chunk),
+                checkInDate=check_in,
+                checkOutDate=check_out,
+                adults=adults,
+            )
+        )
+
+    unavailable = set()
+    chunks = [pending[i : i + chunk_size] for i in range(0, len(pending), chunk_size)]
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as pool:
+        futures = {pool.submit(fetch_chunk, chunk): chunk for chunk in chunks}
+        for future in as_completed(futures):
+            chunk = futures[future]
+            try:
+                chunk_prices = future.result()
+            except ResponseError as error:
+                print(f"Amadeus API error for hotels {', '.join(chunk)}: {error}")
+                unavailable.update(chunk)
+                continue
+            except Exception as e:
+                print(f"Error fetching prices for hotels {', '.join(chunk)}: {e}")
+                unavailable.update(chunk)
+                continue
+            for hotel_id in chunk:
+                price = chunk_prices.get(hotel_id)
+                prices[hotel_id] = price
+                gateway.cache.put(
+                    _price_key(hotel_id, check_in, check_out, adults), price, PRICE_TTL
+                )
+    return prices, unavailable
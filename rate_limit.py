@@ -0,0 +1,73 @@
+"""
+Rate Limit Module
+
+Token-bucket rate limiters for external APIs: one for the threads of a process
+and one whose state lives in shared memory, so every process of a batch run
+shares a single limit
+"""
+import multiprocessing
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket allowing `rate` calls per second with bursts of `capacity`.
+    A rate of 0 or less does not limit calls.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Blocks until a call is allowed
+        """
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class SharedTokenBucket(TokenBucket):
+    """
+    Token bucket shared by processes. Create it before starting the processes and hand
+    it to them when they start, e.g. through a process pool's initargs.
+    """
+
+    def __init__(self, rate, capacity, context=multiprocessing):
+        self.rate = rate
+        self.capacity = capacity
+        # The monotonic clock is system wide, so its readings compare across processes
+        self._state = context.Array("d", [capacity, time.monotonic()])
+        self.lock = self._state.get_lock()
+
+    @property
+    def tokens(self):
+        return self._state[0]
+
+    @tokens.setter
+    def tokens(self, value):
+        self._state[0] = value
+
+    @property
+    def updated(self):
+        return self._state[1]
+
+    @updated.setter
+    def updated(self, value):
+        self._state[1] = value
@@ -0,0 +1,179 @@
+"""
+Rating Aggregates Module
+
+Parses the stringified ratings dict of every review once, when the cache is
+built, into a per-hotel table of rating means, counts and recency weighted
+means, so a whole city's ratings can be looked up in one vectorized step
+"""
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+RATINGS_NAME = "hotel_ratings.parquet"
+ASPECTS = ("overall", "service", "cleanliness", "value", "location", "sleep_quality", "rooms")
+# A review this many days older than another counts half as much in the recent means
+RECENCY_HALF_LIFE_DAYS = 365
+DATE_FORMAT = "%B %d, %Y"
+
+
+def parse_ratings(ratings):
+    """
+    Extracts every aspect from an array of stringified ratings dicts into a
+    (reviews x aspects) float array, with NaN where an aspect was not rated
+
+    >>> parse_ratings(pa.array(["{'service': 5.0, 'overall': 4.0}", None]))[:, :2]
+    array([[ 4.,  5.],
+           [nan, nan]])
+    """
+    ratings = pa.array(ratings, type=pa.string())
+    columns = []
+    for aspect in ASPECTS:
+        match = pc.extract_regex(ratings, rf"'{aspect}': (?P<value>-?[0-9.]+)")
+        columns.append(
+            pc.struct_field(match, "value").cast(pa.float64()).to_numpy(zero_copy_only=False)
+        )
+    return np.column_stack(columns).astype(np.float64)
+
+
+def _recency_weights(dates):
+    """
+    Weights reviews by date, doubling every RECENCY_HALF_LIFE_DAYS; undated reviews get 0
+    """
+    parsed = pc.strptime(
+        pa.array(dates, type=pa.string()), format=DATE_FORMAT, unit="s", error_is_null=True
+    )
+    days = pc.divide(parsed.cast(pa.int64()).cast(pa.float64()), 86400.0)
+    days = days.to_numpy(zero_copy_only=False)
+    return np.nan_to_num(np.exp2(days / RECENCY_HALF_LIFE_DAYS), nan=0.0)
+
+
+def _group_sums(ids, values):
+    """
+    Sums the rows of values per id, returning the sorted unique ids and their sums
+    """
+    unique_ids, inverse = np.unique(ids, return_inverse=True)
+    sums = np.zeros((len(unique_ids), values.shape[1]))
+    np.add.at(sums, inverse, values)
+    return unique_ids, sums
+
+
+def build_rating_table(reviews_dir, out_path):
+    """
+    Aggregates the ratings of the cached reviews into one row per offering with the
+    mean, count and recency weighted mean of every aspect
+    """
+    dataset = ds.dataset(reviews_dir, format="parquet", partitioning="hive")
+    columns = [col for col in ("offering_id", "ratings", "date") if col in dataset.schema.names]
+    num_aspects = len(ASPECTS)
+    parts = []
+    if "ratings" in columns:
+        for batch in dataset.to_batches(columns=columns):
+            if not batch.num_rows:
+                continue
+            values = parse_ratings(batch.column("ratings"))
+            rated = ~np.isnan(values)
+            values = np.nan_to_num(values)
+            weights = (
+                _recency_weights(batch.column("date"))
+                if "date" in columns
+                else np.zeros(batch.num_rows)
+            )[:, None] * rated
+            # Per offering: rating sums, counts, weighted sums and weights for every aspect
+            parts.append(
+                _group_sums(
+                    batch.column("offering_id").to_numpy(),
+                    np.hstack([values, rated, values * weights, weights]),
+                )
+            )
+
+    if parts:
+        offering_ids, sums = _group_sums(
+            np.concatenate([ids for ids, _ in parts]), np.vstack([s for _, s in parts])
+        )
+    else:
+        offering_ids, sums = np.empty(0, dtype=np.int64), np.empty((0, 4 * num_aspects))
+    totals, counts, weighted, weights = np.split(sums, 4, axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = totals / counts
+        # Undated reviews have no weight, so fall back to the plain mean without dates
+        recent = np.where(weights > 0, weighted / weights, means)
+
+    table = {"offering_id": pa.array(offering_ids, type=pa.int64())}
+    for i, aspect in enumerate(ASPECTS):
+        table[f"{aspect}_mean"] = pa.array(means[:, i], type=pa.float32(), from_pandas=True)
+        table[f"{aspect}_count"] = pa.array(counts[:, i], type=pa.int32())
+        table[f"{aspect}_recent"] = pa.array(recent[:, i], type=pa.float32(), from_pandas=True)
+    pq.write_table(pa.table(table), out_path)
+
+
+class RatingTable:
+    """
+    Per-offering rating aggregates as (offerings x aspects) NumPy arrays
+    """
+
+    def __init__(self, path):
+        table = pq.read_table(path)
+        self.offering_ids = table["offering_id"].to_numpy()
+
+        def stack(suffix, dtype):
+            if not len(self.offering_ids):
+                return np.empty((0, len(ASPECTS)), dtype=dtype)
+            return np.column_stack(
+                [
+                    table[f"{aspect}_{suffix}"].to_numpy(zero_copy_only=False)
+                    for aspect in ASPECTS
+                ]
+            ).astype(dtype)
+
+        self.means = stack("mean", np.float32)
+        self.counts = stack("count", np.int32)
+        self.recent = stack("recent", np.float32)
+
+    def lookup(self, offering_ids):
+        """
+        Returns (means, counts, recent) rows for offering_ids, with NaN means and zero
+        counts for offerings without ratings
+        """
+        offering_ids = np.asarray(offering_ids, dtype=np.int64)
+        n = len(offering_ids)
+        means = np.full((n, len(ASPECTS)), np.nan, dtype=np.float32)
+        counts = np.zeros((n, len(ASPECTS)), dtype=np.int32)
+        recent = means.copy()
+        if len(self.offering_ids):
+            pos = np.minimum(
+                np.searchsorted(self.offering_ids, offering_ids), len(self.offering_ids) - 1
+            )
+            known = self.offering_ids[pos] == offering_ids
+            means[known] = self.means[pos[known]]
+            counts[known] = self.counts[pos[known]]
+            recent[known] = self.recent[pos[known]]
+        return means, counts, recent
+
+    def aspect(self, offering_ids, aspect="overall", recent=True):
+        """
+        Returns one aspect's (recency weighted) mean for each of offering_ids
+        """
+        means, _, recent_means = self.lookup(offering_ids)
+        return (recent_means if recent else means)[:, ASPECTS.index(aspect)]
+
+    def summaries(self, offering_ids):
+        """
+        Returns a compact ratings dict per offering for LLM prompts: the mean of every
+        rated aspect, the recency weighted overall rating and the number of ratings
+        """
+        means, counts, recent = self.lookup(offering_ids)
+        overall = ASPECTS.index("overall")
+        summaries = []
+        for row_means, row_counts, row_recent in zip(means, counts, recent):
+            summary = {
+                aspect: round(float(mean), 1)
+                for aspect, mean, count in zip(ASPECTS, row_means, row_counts)
+                if count
+            }
+            if row_counts[overall]:
+                summary["recent_overall"] = round(float(row_recent[overall]), 1)
+            summary["num_ratings"] = int(row_counts[overall])
+            summaries.append(summary)
+        return summaries
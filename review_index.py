@@ -0,0 +1,138 @@
+"""
+Review Index Module
+
+Stores the reviews sorted by offering_id in a memory-mapped Arrow file with
+per-offering offsets, so a random sample of k of a hotel's reviews can be read
+without scanning the reviews table
+"""
+import os
+import random
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+INDEX_NAME = "review_index.arrow"
+OFFSETS_NAME = "review_index_offsets.npz"
+
+# Review columns sent to the LLM, mapped to the keys used in the review records
+REVIEW_FIELDS = {"title": "title", "text": "text", "ratings": "rating"}
+
+
+def sample_key(seed, offering_id):
+    """
+    Derives a per-hotel random seed from a run-wide seed; without a run-wide seed the
+    samples are not reproducible
+    """
+    return None if seed is None else f"{seed}:{offering_id}"
+
+
+def _partition_groups(dataset):
+    """
+    Groups the files of a partitioned dataset by their partition values
+    """
+    groups = {}
+    for fragment in dataset.get_fragments():
+        key = tuple(sorted(ds.get_partition_keys(fragment.partition_expression).items()))
+        groups.setdefault(key, []).append(fragment.path)
+    return groups.values()
+
+
+def build_review_index(reviews_dir, index_dir):
+    """
+    Writes the cached reviews grouped by offering_id into an uncompressed Arrow file,
+    along with the start and end row of every offering.
+    Partitions are sorted one at a time, so memory is bounded by the largest locality.
+    """
+    dataset = ds.dataset(reviews_dir, format="parquet", partitioning="hive")
+    available = set(dataset.schema.names)
+    missing = set(REVIEW_FIELDS) - available
+    if missing:
+        print(
+            f"Warning: The following required columns are missing in reviews.csv: {missing}. Review analysis will be limited."
+        )
+    fields = [col for col in REVIEW_FIELDS if col in available]
+    schema = pa.schema([dataset.schema.field(col) for col in ["offering_id"] + fields])
+
+    ids, starts, ends = [], [], []
+    offset = 0
+    with pa.OSFile(os.path.join(index_dir, INDEX_NAME), "wb") as sink:
+        with pa.ipc.new_file(sink, schema) as writer:
+            for paths in _partition_groups(dataset):
+                table = ds.dataset(paths, format="parquet").to_table(columns=schema.names)
+                # Reviews without a title, text or rating have nothing to send to the LLM
+                if fields:
+                    has_content = pc.is_valid(table[fields[0]])
+                    for col in fields[1:]:
+                        has_content = pc.or_(has_content, pc.is_valid(table[col]))
+                    table = table.filter(has_content)
+                table = table.sort_by("offering_id").cast(schema)
+                writer.write_table(table)
+
+                offering_ids = table["offering_id"].to_numpy()
+                part_ids, part_starts = np.unique(offering_ids, return_index=True)
+                ids.append(part_ids)
+                starts.append(part_starts + offset)
+                ends.append(np.append(part_starts[1:], len(offering_ids)) + offset)
+                offset += len(offering_ids)
+
+    # Each offering lives in a single locality partition, so its rows are contiguous
+    empty = [np.empty(0, dtype=np.int64)]
+    ids, starts, ends = (np.concatenate(arr or empty) for arr in (ids, starts, ends))
+    order = np.argsort(ids)
+    np.savez(
+        os.path.join(index_dir, OFFSETS_NAME),
+        offering_ids=ids[order],
+        starts=starts[order],
+        ends=ends[order],
+    )
+
+
+class ReviewIndex:
+    """
+    Read access to the review index built by build_review_index
+    """
+
+    def __init__(self, index_dir):
+        source = pa.memory_map(os.path.join(index_dir, INDEX_NAME))
+        self.table = pa.ipc.open_file(source).read_all()
+        offsets = np.load(os.path.join(index_dir, OFFSETS_NAME))
+        self.offering_ids = offsets["offering_ids"]
+        self.starts = offsets["starts"]
+        self.ends = offsets["ends"]
+
+    def _range(self, offering_id):
+        """
+        Returns the start and end rows of an offering's reviews
+        """
+        pos = np.searchsorted(self.offering_ids, offering_id)
+        if pos == len(self.offering_ids) or self.offering_ids[pos] != offering_id:
+            return 0, 0
+        return int(self.starts[pos]), int(self.ends[pos])
+
+    def _records(self, rows):
+        """
+        Converts review rows into review records, leaving out empty fields
+        """
+        records = []
+        for review in rows.to_pylist():
+            records.append(
+                {
+                    REVIEW_FIELDS[col]: value
+                    for col, value in review.items()
+                    if col in REVIEW_FIELDS and value is not None
+                }
+            )
+        return records
+
+    def sample(self, offering_id, k, seed=None):
+        """
+        Returns k random review records for an offering, or all of them if it has k or fewer.
+        Only the sampled rows are read.
+        """
+        start, end = self._range(offering_id)
+        if end - start <= k:
+            return self._records(self.table.slice(start, end - start))
+        rows = sorted(random.Random(seed).sample(range(start, end), k))
+        return self._records(self.table.take(rows))
@@ -0,0 +1,191 @@
+"""
+Review Ranking Module
+
+A BM25 index over each hotel's reviews, built from the review index when the
+cache is built, that ranks hotels against a query on the CPU so only a
+shortlist has to be scored by the LLM
+"""
+import json
+import os
+import re
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from review_index import INDEX_NAME, OFFSETS_NAME
+
+VECTORS_NAME = "review_vectors"
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Review rows tokenized at once while building
+BUILD_BATCH_ROWS = 200_000
+
+STOPWORDS = frozenset(
+    """
+    a about after all also am an and any are as at be been but by can could did do does
+    for from had has have he her here his how i if in into is it its just me more most my
+    no not of on or our out over she so some than that the their them then there these
+    they this to too up us very was we were what when where which while who will with
+    would you your hotel hotels room rooms stay stayed
+    """.split()
+)
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+# Maps every byte that cannot be part of a term to a space
+_TERM_BYTES = np.full(256, ord(" "), dtype=np.uint8)
+for _byte in b"abcdefghijklmnopqrstuvwxyz0123456789":
+    _TERM_BYTES[_byte] = _byte
+
+
+def tokenize(text):
+    """
+    Lowercases text and splits it into the terms the index is built from
+
+    >>> tokenize("Quiet, family-friendly hotel with a GOOD breakfast!")
+    ['quiet', 'family', 'friendly', 'good', 'breakfast']
+    """
+    return [
+        t for t in _TOKEN_RE.findall(str(text).lower()) if len(t) > 1 and t not in STOPWORDS
+    ]
+
+
+def _batch_terms(table, doc_of_row, vocabulary):
+    """
+    Returns (doc, term) pairs for every token of a batch of review rows, adding new
+    terms to vocabulary
+    """
+    title, text = (pc.fill_null(table[col].combine_chunks(), "") for col in ("title", "text"))
+    text = pc.ascii_lower(pc.binary_join_element_wise(title, text, " "))
+    # Same terms as tokenize, but a byte lookup and whitespace split is far faster than
+    # splitting on a regex
+    _, offsets, data = text.buffers()
+    text = pa.StringArray.from_buffers(
+        len(text),
+        offsets,
+        pa.py_buffer(_TERM_BYTES[np.frombuffer(data, dtype=np.uint8)]),
+        offset=text.offset,
+    )
+    tokens = pc.ascii_split_whitespace(text)
+    rows = pc.list_parent_indices(tokens).to_numpy()
+    encoded = pc.list_flatten(tokens).dictionary_encode()
+    local_terms = encoded.dictionary.to_pylist()
+    # Short words and stopwords are dropped by their dictionary entry, not per token
+    global_ids = np.array(
+        [
+            vocabulary.setdefault(term, len(vocabulary))
+            if len(term) > 1 and term not in STOPWORDS
+            else -1
+            for term in local_terms
+        ],
+        dtype=np.int64,
+    )
+    terms = global_ids[encoded.indices.to_numpy()] if local_terms else np.empty(0, np.int64)
+    keep = terms >= 0
+    rows, terms = rows[keep], terms[keep]
+    return doc_of_row[rows], terms
+
+
+def build_review_vectors(index_dir):
+    """
+    Builds the BM25 index from the review index in index_dir. Each term's postings hold
+    the hotels it occurs in with their precomputed BM25 weights, so ranking only reads
+    the postings of the query terms.
+    """
+    source = pa.memory_map(os.path.join(index_dir, INDEX_NAME))
+    table = pa.ipc.open_file(source).read_all()
+    offsets = np.load(os.path.join(index_dir, OFFSETS_NAME))
+    offering_ids = offsets["offering_ids"]
+    out_dir = os.path.join(index_dir, VECTORS_NAME)
+    os.makedirs(out_dir, exist_ok=True)
+
+    vocabulary = {}
+    keys, counts = [], []
+    if {"title", "text"} <= set(table.schema.names) and table.num_rows:
+        # Row r of the review index belongs to the hotel at doc_of_row[r]
+        doc_of_row = np.empty(table.num_rows, dtype=np.int64)
+        for doc, (start, end) in enumerate(zip(offsets["starts"], offsets["ends"])):
+            doc_of_row[start:end] = doc
+        for start in range(0, table.num_rows, BUILD_BATCH_ROWS):
+            batch = table.slice(start, BUILD_BATCH_ROWS)
+            docs, terms = _batch_terms(
+                batch, doc_of_row[start : start + batch.num_rows], vocabulary
+            )
+            batch_keys, batch_counts = np.unique(docs << 32 | terms, return_counts=True)
+            keys.append(batch_keys)
+            counts.append(batch_counts)
+
+    # A hotel's reviews can span two batches, so counts are merged once more
+    if keys:
+        keys, inverse = np.unique(np.concatenate(keys), return_inverse=True)
+        tf = np.bincount(inverse, weights=np.concatenate(counts))
+    else:
+        keys, tf = np.empty(0, np.int64), np.empty(0)
+    docs = (keys >> 32).astype(np.int32)
+    terms = (keys & 0xFFFFFFFF).astype(np.int64)
+
+    doc_lengths = np.bincount(docs, weights=tf, minlength=len(offering_ids))
+    avg_length = doc_lengths.mean() if len(doc_lengths) and doc_lengths.mean() else 1.0
+    df = np.bincount(terms, minlength=len(vocabulary))
+    n = len(offering_ids)
+    idf = np.log(1 + (n - df + 0.5) / (df + 0.5))
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_lengths[docs] / avg_length)
+    weights = (idf[terms] * tf * (BM25_K1 + 1) / (tf + norm)).astype(np.float32)
+
+    order = np.argsort(terms, kind="stable")
+    term_ptr = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(terms, minlength=len(vocabulary)), out=term_ptr[1:])
+    np.save(os.path.join(out_dir, "term_ptr.npy"), term_ptr)
+    np.save(os.path.join(out_dir, "docs.npy"), docs[order])
+    np.save(os.path.join(out_dir, "weights.npy"), weights[order])
+    np.save(os.path.join(out_dir, "doc_lengths.npy"), doc_lengths.astype(np.float32))
+    np.save(os.path.join(out_dir, "offering_ids.npy"), offering_ids)
+    with open(os.path.join(out_dir, "vocabulary.json"), "w") as f:
+        json.dump(sorted(vocabulary, key=vocabulary.get), f)
+
+
+class ReviewRanker:
+    """
+    Ranks hotels against a query with the BM25 index built by build_review_vectors.
+    The postings are memory-mapped, so only the query terms' postings are read.
+    """
+
+    def __init__(self, index_dir):
+        vectors_dir = os.path.join(index_dir, VECTORS_NAME)
+        with open(os.path.join(vectors_dir, "vocabulary.json")) as f:
+            self.vocabulary = {term: i for i, term in enumerate(json.load(f))}
+        self.term_ptr = np.load(os.path.join(vectors_dir, "term_ptr.npy"))
+        self.docs = np.load(os.path.join(vectors_dir, "docs.npy"), mmap_mode="r")
+        self.weights = np.load(os.path.join(vectors_dir, "weights.npy"), mmap_mode="r")
+        self.doc_lengths = np.load(os.path.join(vectors_dir, "doc_lengths.npy"))
+        self.offering_ids = np.load(os.path.join(vectors_dir, "offering_ids.npy"))
+
+    def scores(self, query):
+        """
+        Returns the BM25 score of every indexed hotel for the query
+        """
+        scores = np.zeros(len(self.offering_ids), dtype=np.float32)
+        for term in set(tokenize(query)):
+            t = self.vocabulary.get(term)
+            if t is None:
+                continue
+            start, end = self.term_ptr[t], self.term_ptr[t + 1]
+            # A hotel occurs at most once in a term's postings
+            scores[self.docs[start:end]] += self.weights[start:end]
+        return scores
+
+    def rank(self, query, offering_ids):
+        """
+        Returns the positions of offering_ids from best to worst match for the query.
+        Ties, including hotels matching no query term, go to hotels with more review text.
+        """
+        offering_ids = np.asarray(offering_ids, dtype=self.offering_ids.dtype)
+        if not len(self.offering_ids):
+            return np.arange(len(offering_ids))
+        pos = np.minimum(
+            np.searchsorted(self.offering_ids, offering_ids), len(self.offering_ids) - 1
+        )
+        known = self.offering_ids[pos] == offering_ids
+        scores = np.where(known, self.scores(query)[pos], 0)
+        lengths = np.where(known, self.doc_lengths[pos], 0)
+        return np.lexsort((-lengths, -scores))
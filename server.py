@@ -0,0 +1,314 @@
+"""
+Recommendation Service
+
+Serves hotel recommendations over HTTP/JSON. Offerings, the review index and
+each locality's matched hotels are loaded once and shared by all requests, so a
+request only pays for the local pre-ranking, the DeepSeek scoring of the
+shortlist and the price lookup.
+
+Usage:
+    python server.py --port 8000 [--preload Boston "New York City"]
+
+Endpoints:
+    GET  /health
+    GET  /localities
+    POST /recommend  {"locality": "Boston", "query": "quiet, good breakfast",
+                      "check_in": "2026-12-01", "check_out": "2026-12-02", "adults": 1}
+    POST /recommend/stream  same body; answers with newline-delimited JSON events:
+                      "ranking" whenever the best hotels so far change, "price" for
+                      every hotel priced and finally "result" (or "error")
+"""
+import argparse
+import json
+import threading
+import time
+from concurrent.futures import Future
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+from amadeus_client import EMPTY_TTL, REFERENCE_TTL, AmadeusGateway
+from data_cache import open_rating_table, open_review_index, open_review_ranker
+from pipeline import (
+    build_review_records,
+    default_dates,
+    fetch_hotels,
+    hotel_names,
+    load_offerings_table,
+    locality_offerings,
+    lookup_iata,
+    match_hotels,
+    price_status,
+    shortlist_hotels,
+    stream_hotels,
+)
+
+
+def stay_dates(check_in, check_out):
+    """
+    Validates ISO check-in and check-out dates and returns them as YYYY-MM-DD strings
+    """
+    try:
+        check_in_date = date.fromisoformat(check_in)
+        check_out_date = date.fromisoformat(check_out)
+    except (TypeError, ValueError):
+        raise ValueError(
+            f"check_in and check_out must be ISO dates (YYYY-MM-DD), "
+            f"got {check_in!r} and {check_out!r}"
+        ) from None
+    if check_out_date <= check_in_date:
+        raise ValueError(f"check_out {check_out} must be after check_in {check_in}")
+    return check_in_date.isoformat(), check_out_date.isoformat()
+
+
+def guest_count(adults):
+    """
+    Validates the number of adults, a positive integer or a string of digits
+    """
+    if isinstance(adults, str) and adults.isdigit():
+        adults = int(adults)
+    if isinstance(adults, bool) or not isinstance(adults, int) or adults < 1:
+        raise ValueError(f"adults must be a positive integer, got {adults!r}")
+    return adults
+
+
+class RecommenderService:
+    """
+    Holds the warm, read-only pipeline state and answers recommendation requests
+    """
+
+    def __init__(self, gateway=None, offerings_df=None):
+        self.gateway = gateway or AmadeusGateway()
+        self.offerings_df = offerings_df if offerings_df is not None else load_offerings_table()
+        self.review_index = open_review_index()
+        self.review_ranker = open_review_ranker()
+        self.rating_table = open_rating_table()
+        self.localities = sorted(self.offerings_df["locality"].dropna().unique())
+        self._lock = threading.Lock()
+        self._locality_state = {}
+
+    def locality_state(self, locality):
+        """
+        Returns the hotel names and matched hotels of a locality, preparing them on
+        first use and again once the hotel list is due for a refresh. Concurrent first
+        requests for a locality share one preparation.
+        """
+        with self._lock:
+            future = self._locality_state.get(locality)
+            if (
+                future is not None
+                and future.done()
+                and future.result()["expires_at"] <= time.time()
+            ):
+                future = None
+            owner = future is None
+            if owner:
+                future = self._locality_state[locality] = Future()
+        if not owner:
+            return future.result()
+        try:
+            offerings_subset, region = locality_offerings(self.offerings_df, locality)
+            iata_code = lookup_iata(self.gateway, locality, region)
+            hotels_df, fetched_at = fetch_hotels(self.gateway, iata_code)
+            matched_hotels_df = match_hotels(locality, offerings_subset, hotels_df, fetched_at)
+            # Expire with the cached hotel list, or soon if no hotels were found
+            if hotels_df.empty or fetched_at is None:
+                expires_at = time.time() + EMPTY_TTL
+            else:
+                expires_at = fetched_at.timestamp() + REFERENCE_TTL
+            state = {
+                "iata_code": iata_code,
+                "names": hotel_names(hotels_df),
+                "matched": matched_hotels_df,
+                "expires_at": expires_at,
+            }
+            future.set_result(state)
+            return state
+        except BaseException as e:
+            # Let the next request retry instead of caching the failure
+            with self._lock:
+                del self._locality_state[locality]
+            future.set_exception(e)
+            raise
+
+    def recommend(self, locality, query, check_in=None, check_out=None, adults=1, on_event=None):
+        """
+        Returns the top hotels for a query in a locality with their current lowest price.
+        on_event, if given, receives the "ranking" and "price" events of stream_hotels
+        with hotel names and flattened prices.
+        """
+        if locality not in self.localities:
+            raise ValueError(f"Unknown locality: {locality}")
+        if not check_in and not check_out:
+            check_in, check_out = default_dates()
+        else:
+            check_in, check_out = stay_dates(check_in, check_out)
+        adults = guest_count(adults)
+        state = self.locality_state(locality)
+        records = []
+        if not state["matched"].empty:
+            shortlist_df = shortlist_hotels(
+                self.review_ranker, state["matched"], query, ratings=self.rating_table
+            )
+            records = build_review_records(
+                self.review_index, shortlist_df, ratings=self.rating_table
+            )
+
+        def describe(hotel):
+            hotel_id = hotel.get("hotel_id")
+            return {
+                "hotel_id": hotel_id,
+                "name": state["names"].get(hotel_id, hotel_id),
+                "score": hotel.get("score"),
+                "key_points": hotel.get("key_points", []),
+            }
+
+        def forward(event):
+            if event["event"] == "ranking":
+                event = dict(event, hotels=[describe(hotel) for hotel in event["hotels"]])
+            else:
+                price = event["price"]
+                event = {
+                    "event": "price",
+                    "hotel_id": event["hotel_id"],
+                    "price": price["price"] if price else None,
+                    "currency": price["currency"] if price else None,
+                    "price_status": event["status"],
+                }
+            on_event(event)
+
+        _, top_hotels_sorted, prices, unavailable = stream_hotels(
+            self.gateway,
+            records,
+            query,
+            check_in,
+            check_out,
+            adults=adults,
+            on_event=forward if on_event else None,
+        )
+        hotels = []
+        for hotel in top_hotels_sorted:
+            price = prices.get(hotel.get("hotel_id"))
+            hotels.append(
+                {
+                    **describe(hotel),
+                    "price": price["price"] if price else None,
+                    "currency": price["currency"] if price else None,
+                    "price_status": price_status(hotel.get("hotel_id"), prices, unavailable),
+                }
+            )
+        return {
+            "locality": locality,
+            "iata_code": state["iata_code"],
+            "check_in": check_in,
+            "check_out": check_out,
+            "hotels": hotels,
+        }
+
+
+class RecommenderHandler(BaseHTTPRequestHandler):
+    """
+    JSON API over a shared RecommenderService
+    """
+
+    service = None
+    _streaming = False
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send(200, {"status": "ok"})
+        elif self.path == "/localities":
+            self._send(200, {"localities": self.service.localities})
+        else:
+            self._send(404, {"error": f"Unknown path {self.path}"})
+
+    def do_POST(self):
+        if self.path not in ("/recommend", "/recommend/stream"):
+            self._send(404, {"error": f"Unknown path {self.path}"})
+            return
+        stream = self.path == "/recommend/stream"
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            if not isinstance(body, dict):
+                raise ValueError("The request body must be a JSON object")
+            missing = [field for field in ("locality", "query") if not body.get(field)]
+            if missing:
+                raise ValueError(f"Missing field: {', '.join(missing)}")
+            result = self.service.recommend(
+                body["locality"],
+                body["query"],
+                check_in=body.get("check_in"),
+                check_out=body.get("check_out"),
+                adults=body.get("adults", 1),
+                on_event=self._send_event if stream else None,
+            )
+        except (ValueError, TypeError) as e:
+            self._fail(400, e)
+            return
+        except Exception as e:
+            self._fail(500, e)
+            return
+        if stream:
+            self._send_event({"event": "result", **result})
+        else:
+            self._send(200, result)
+
+    def _send_event(self, event):
+        """
+        Writes one line of a streamed response, sending the headers with the first one
+        """
+        if not self._streaming:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.end_headers()
+            self._streaming = True
+        self.wfile.write(json.dumps(event).encode() + b"\n")
+        self.wfile.flush()
+
+    def _fail(self, status, error):
+        # Once a stream has started its status is sent, so the error becomes an event
+        if not self._streaming:
+            self._send(status, {"error": str(error)})
+            return
+        try:
+            self._send_event({"event": "error", "error": str(error)})
+        except OSError:
+            pass
+
+    def _send(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hotel recommendation service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--preload", nargs="*", default=[], help="Localities to prepare at startup"
+    )
+    args = parser.parse_args()
+
+    service = RecommenderService()
+    for locality in args.preload:
+        service.locality_state(locality)
+
+    handler = type("Handler", (RecommenderHandler,), {"service": service})
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+    print(f"Recommendation service listening on http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()